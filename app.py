@@ -1,25 +1,41 @@
+import time
+STARTED_AT = time.perf_counter()  # Taken before the heavy imports for the startup report
+
 from flask import Flask, render_template, request, jsonify
 from flask_cors import CORS
 import os
 import sys
 from database import init_app as init_database
 
+IMPORTS_DONE_AT = time.perf_counter()
+
 def create_app():
+    create_started_at = time.perf_counter()
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'your-secret-key-here'
     app.config['DATABASE'] = 'engineering_tools.db'
+    app.config['SCAN_WORKERS'] = int(os.environ.get('SCAN_WORKERS', 8))  # Threads used to walk customer folders
+    app.config['APPLY_CONDITIONS_WORKERS'] = int(os.environ.get('APPLY_CONDITIONS_WORKERS', os.cpu_count() or 1))  # Processes used to match naming conditions
+    app.config['SERVER_THREADS'] = int(os.environ.get('SERVER_THREADS', 8))  # Request threads in production mode
+    app.config['STARTUP_BUDGET'] = float(os.environ.get('STARTUP_BUDGET', 3.0))  # Seconds from launch to first request
+    
+    # Seconds spent in each startup phase, reported at /api/startup
+    timings = app.config['STARTUP_TIMINGS'] = {'imports': IMPORTS_DONE_AT - STARTED_AT}
     
     # Enable CORS for Electron
     CORS(app)
     
     # Initialize database
+    phase_started_at = time.perf_counter()
     try:
         init_database(app)
     except Exception as e:
         print(f"Warning: Database initialization failed: {e}")
         print("App will continue without database features")
+    timings['database'] = time.perf_counter() - phase_started_at
     
     # Register blueprints
+    phase_started_at = time.perf_counter()
     from routes.main import main_bp
     from routes.drafting import drafting_bp
     from routes.engineering import engineering_bp
@@ -35,9 +51,36 @@ def create_app():
     app.register_blueprint(d365_bp, url_prefix='/d365')
     app.register_blueprint(job_docs_bp, url_prefix='/job-docs')
     app.register_blueprint(job_structure_bp, url_prefix='/job-structure')
+    timings['blueprints'] = time.perf_counter() - phase_started_at
+    timings['create_app'] = time.perf_counter() - create_started_at
+    
+    @app.before_request
+    def record_first_request():
+        if 'first_request' not in timings:
+            timings['first_request'] = time.perf_counter() - STARTED_AT
+            report = ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in timings.items())
+            print(f"Startup: {report} (budget {app.config['STARTUP_BUDGET']}s)")
+            if timings['first_request'] > app.config['STARTUP_BUDGET']:
+                print("Warning: startup went over its time budget")
     
     return app
 
+def get_port(argv):
+    """Port from --port N or the PORT environment variable; 0 picks a free port"""
+    if '--port' in argv:
+        index = argv.index('--port')
+        if index + 1 < len(argv):
+            return int(argv[index + 1])
+    return int(os.environ.get('PORT', 5000))
+
 if __name__ == '__main__':
     app = create_app()
-    app.run(debug=True, host='127.0.0.1', port=5000)
+    port = get_port(sys.argv)
+    
+    # --production (used by the Electron launcher) serves without the
+    # debugger and reloader on a pool of request threads
+    if '--production' in sys.argv or os.environ.get('APP_MODE') == 'production':
+        from server import serve
+        serve(app, host='127.0.0.1', port=port, threads=app.config['SERVER_THREADS'])
+    else:
+        app.run(debug=True, host='127.0.0.1', port=port)
@@ -1,20 +1,76 @@
 import sqlite3
 import os
+import re
 import json
-from flask import g
+import threading
+from flask import g, has_app_context
+from naming_conditions import apply_naming_conditions_to_structure, clear_alias_cache
 
 DATABASE = 'engineering_tools.db'
 
+# Bump whenever init_database's tables, indexes or migrations change; the
+# database records the version it was last initialized with (PRAGMA
+# user_version) so startup skips all DDL while they match.
+SCHEMA_VERSION = 5
+
+# Applied to every connection. WAL itself is persistent and set once in
+# init_database; with it readers never wait for a writer.
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',   # Safe with WAL, avoids an fsync per commit
+    'PRAGMA cache_size = -20000',    # 20 MB page cache
+    'PRAGMA mmap_size = 268435456',  # Read up to 256 MB through mmap
+    'PRAGMA temp_store = MEMORY'
+)
+STATEMENT_CACHE_SIZE = 256  # Prepared statements kept per connection
+BUSY_TIMEOUT = 30  # Seconds a writer waits for another writer
+
+_thread_local = threading.local()
+
 def get_db_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
+    """Open a new tuned database connection; the caller closes it"""
+    conn = sqlite3.connect(DATABASE, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE)
     conn.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_db():
+    """
+    Get the shared connection for the current request or thread
+    
+    Inside a request the connection lives on flask.g and is closed by
+    close_db at teardown. Background threads get one long-lived connection
+    per thread. Either way callers must not close it, and repeated queries
+    reuse the connection's prepared statement cache.
+    """
+    if has_app_context():
+        if 'db' not in g:
+            g.db = get_db_connection()
+        return g.db
+    
+    conn = getattr(_thread_local, 'db', None)
+    if conn is None:
+        conn = _thread_local.db = get_db_connection()
     return conn
 
+def rollback_thread_db():
+    """Roll back whatever the current thread's long-lived connection has not committed"""
+    conn = getattr(_thread_local, 'db', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
 def init_database():
-    """Initialize the database with required tables"""
+    """Initialize the database with required tables, unless it is already up to date"""
     try:
         conn = get_db_connection()
+        if conn.execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION:
+            delete_pending_structures(conn)
+            conn.commit()
+            conn.close()
+            print(f"Database schema up to date (version {SCHEMA_VERSION})")
+            return
+        
+        conn.execute('PRAGMA journal_mode = WAL')
         
         # Projects table
         conn.execute('''
@@ -105,11 +161,139 @@ def init_database():
                 customer_name TEXT NOT NULL,
                 folder_path TEXT NOT NULL,
                 structure_data TEXT NOT NULL,
+                scan_pending BOOLEAN DEFAULT 0,
+                path_separator TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
+        # Add scan_pending and path_separator to settings tables created before they existed
+        columns = [column['name'] for column in conn.execute('PRAGMA table_info(job_structure_settings)')]
+        if 'scan_pending' not in columns:
+            conn.execute('ALTER TABLE job_structure_settings ADD COLUMN scan_pending BOOLEAN DEFAULT 0')
+        if 'path_separator' not in columns:
+            conn.execute('ALTER TABLE job_structure_settings ADD COLUMN path_separator TEXT')
+        
+        # Job structure items, one row per scanned file or folder.
+        # sort_key is the path with separators replaced by '\x01', so ordering
+        # by it gives the depth first, alphabetical scan order and a folder's
+        # subtree is a single index range.
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_structure_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                structure_id INTEGER NOT NULL,
+                parent_id INTEGER,
+                type TEXT NOT NULL,
+                name TEXT NOT NULL,
+                path TEXT NOT NULL,
+                full_path TEXT,
+                sort_key TEXT NOT NULL,
+                alias TEXT,
+                included BOOLEAN DEFAULT 1,
+                applications TEXT DEFAULT '',
+                collapsed BOOLEAN DEFAULT 0,
+                size INTEGER,
+                file_count INTEGER,
+                total_size INTEGER,
+                FOREIGN KEY (structure_id) REFERENCES job_structure_settings (id),
+                FOREIGN KEY (parent_id) REFERENCES job_structure_items (id)
+            )
+        ''')
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_job_structure_items_path
+            ON job_structure_items (structure_id, path)
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_job_structure_items_sort_key
+            ON job_structure_items (structure_id, sort_key)
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_job_structure_items_parent
+            ON job_structure_items (parent_id)
+        ''')
+        
+        # Add the recursive folder totals to item tables created before they existed
+        columns = [column['name'] for column in conn.execute('PRAGMA table_info(job_structure_items)')]
+        for column in ('file_count', 'total_size'):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE job_structure_items ADD COLUMN {column} INTEGER')
+        
+        # Totals and extension histogram of each structure, materialized when
+        # it is scanned so listings don't have to walk its items
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_structure_stats (
+                structure_id INTEGER PRIMARY KEY,
+                folder_count INTEGER NOT NULL,
+                file_count INTEGER NOT NULL,
+                total_size INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (structure_id) REFERENCES job_structure_settings (id)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_structure_extension_stats (
+                structure_id INTEGER NOT NULL,
+                extension TEXT NOT NULL,
+                file_count INTEGER NOT NULL,
+                total_size INTEGER NOT NULL,
+                PRIMARY KEY (structure_id, extension),
+                FOREIGN KEY (structure_id) REFERENCES job_structure_settings (id)
+            )
+        ''')
+        
+        # Per-entry mtimes from the last scan, used for incremental rescans
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS job_structure_scan_index (
+                structure_id INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                is_dir BOOLEAN NOT NULL,
+                size INTEGER,
+                mtime REAL,
+                PRIMARY KEY (structure_id, path),
+                FOREIGN KEY (structure_id) REFERENCES job_structure_settings (id)
+            )
+        ''')
+        
+        # Full-text index over the items' names, aliases, paths and
+        # applications. It reads the text from job_structure_items (external
+        # content) and the triggers keep it in step with every insert, edit
+        # and delete, whichever code path makes them.
+        search_exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'job_structure_search'"
+        ).fetchone() is not None
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS job_structure_search USING fts5(
+                name, alias, path, applications,
+                content='job_structure_items', content_rowid='id', prefix='2 3'
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS job_structure_items_search_insert
+            AFTER INSERT ON job_structure_items BEGIN
+                INSERT INTO job_structure_search (rowid, name, alias, path, applications)
+                VALUES (new.id, new.name, new.alias, new.path, new.applications);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS job_structure_items_search_delete
+            AFTER DELETE ON job_structure_items BEGIN
+                INSERT INTO job_structure_search (job_structure_search, rowid, name, alias, path, applications)
+                VALUES ('delete', old.id, old.name, old.alias, old.path, old.applications);
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS job_structure_items_search_update
+            AFTER UPDATE OF name, alias, path, applications ON job_structure_items BEGIN
+                INSERT INTO job_structure_search (job_structure_search, rowid, name, alias, path, applications)
+                VALUES ('delete', old.id, old.name, old.alias, old.path, old.applications);
+                INSERT INTO job_structure_search (rowid, name, alias, path, applications)
+                VALUES (new.id, new.name, new.alias, new.path, new.applications);
+            END
+        ''')
+        if not search_exists:
+            conn.execute("INSERT INTO job_structure_search (job_structure_search) VALUES ('rebuild')")
+        
         # Naming conditions table
         conn.execute('''
             CREATE TABLE IF NOT EXISTS naming_conditions (
@@ -119,11 +303,24 @@ def init_database():
                 replacement TEXT NOT NULL,
                 chains TEXT,
                 enabled BOOLEAN DEFAULT 1,
+                disabled_reason TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
+        # Add disabled_reason to naming condition tables created before it existed
+        columns = [column['name'] for column in conn.execute('PRAGMA table_info(naming_conditions)')]
+        if 'disabled_reason' not in columns:
+            conn.execute('ALTER TABLE naming_conditions ADD COLUMN disabled_reason TEXT')
+        
+        migrate_structure_data_blobs(conn)
+        record_path_separators(conn)
+        compact_structure_full_paths(conn)
+        materialize_structure_stats(conn)
+        delete_pending_structures(conn)
+        
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
         conn.commit()
         conn.close()
         print("Database initialized successfully")
@@ -142,29 +339,505 @@ def init_app(app):
     app.teardown_appcontext(close_db)
     init_database()
 
+# Job Structure Items Database Functions
+STRUCTURE_ITEM_FIELDS = ('included', 'alias', 'applications', 'collapsed')
+
+def _parent_path(path, name):
+    """Return the parent path of an item, whichever separator the path uses"""
+    return path[:-len(name) - 1] if len(path) > len(name) else ''
+
+# Columns of each item in the compact structure encoding
+COMPACT_ITEM_COLUMNS = ('parent', 'name', 'is_folder', 'size', 'alias', 'included', 'applications', 'collapsed')
+
+def join_structure_path(folder_path, path, separator):
+    """Rebuild an item's full path from its structure's root folder and its relative path"""
+    if folder_path.endswith(separator):
+        return folder_path + path
+    return folder_path + separator + path
+
+def _get_structure_root(conn, structure_id):
+    """(folder_path, path_separator) of a structure, or (None, None) if it doesn't exist"""
+    row = conn.execute(
+        'SELECT folder_path, path_separator FROM job_structure_settings WHERE id = ?',
+        (structure_id,)
+    ).fetchone()
+    return (row['folder_path'], row['path_separator']) if row else (None, None)
+
+def structure_item_to_dict(row, folder_path=None, separator=None):
+    """
+    Convert a job_structure_items row to the structure item dict used by the API
+    
+    full_path is only stored when it can't be rebuilt from the structure's
+    folder_path, path separator and the item's path, so pass those to get it
+    back.
+    """
+    full_path = row['full_path']
+    if full_path is None and folder_path is not None and separator is not None:
+        full_path = join_structure_path(folder_path, row['path'], separator)
+    
+    item = {
+        'type': row['type'],
+        'name': row['name'],
+        'path': row['path'],
+        'full_path': full_path,
+        'included': bool(row['included']),
+        'alias': row['alias'],
+        'applications': row['applications'] or ''
+    }
+    
+    if row['type'] == 'folder':
+        item['collapsed'] = bool(row['collapsed'])
+        item['children'] = []
+    else:
+        file_name, file_ext = os.path.splitext(row['name'])
+        item['file_name'] = file_name
+        item['file_extension'] = file_ext
+        item['size'] = row['size']
+    
+    return item
+
+def get_structure_items(conn, structure_id):
+    """Get all items of a structure in scan order"""
+    rows = conn.execute('''
+        SELECT * FROM job_structure_items
+        WHERE structure_id = ?
+        ORDER BY sort_key
+    ''', (structure_id,)).fetchall()
+    folder_path, separator = _get_structure_root(conn, structure_id)
+    return [structure_item_to_dict(row, folder_path, separator) for row in rows]
+
+def get_structure_items_compact(conn, structure_id):
+    """
+    Get all items of a structure in the compact encoding
+    
+    The root folder is recorded once and each item is a list of
+    COMPACT_ITEM_COLUMNS values: the index of its parent in the list (-1 at
+    the top level), its name, 1 for folders, its size, its alias (None when
+    it is the name) and its editable fields. Paths are rebuilt by joining
+    names down from the root with the separator recorded at scan time.
+    """
+    folder_path, separator = _get_structure_root(conn, structure_id)
+    rows = conn.execute('''
+        SELECT id, parent_id, type, name, alias, included, applications, collapsed, size
+        FROM job_structure_items
+        WHERE structure_id = ?
+        ORDER BY sort_key
+    ''', (structure_id,))
+    
+    positions = {}
+    items = []
+    for row in rows:
+        positions[row['id']] = len(items)
+        items.append([
+            positions.get(row['parent_id'], -1),
+            row['name'],
+            1 if row['type'] == 'folder' else 0,
+            row['size'],
+            None if row['alias'] == row['name'] else row['alias'],
+            1 if row['included'] else 0,
+            row['applications'] or '',
+            1 if row['collapsed'] else 0
+        ])
+    
+    return {
+        'root': folder_path,
+        'separator': separator,
+        'columns': COMPACT_ITEM_COLUMNS,
+        'items': items
+    }
+
+def get_structure_children(conn, structure_id, parent_path=''):
+    """
+    Get the direct children of a folder ('' for the top level) in scan order
+    
+    Each item also carries its row id and, for folders, child_count so a
+    lazily loaded tree knows which folders can be expanded, plus the
+    recursive file_count and total_size materialized at scan time.
+    """
+    if parent_path:
+        parent = conn.execute(
+            'SELECT id FROM job_structure_items WHERE structure_id = ? AND path = ?',
+            (structure_id, parent_path)
+        ).fetchone()
+        if parent is None:
+            return None
+        where, params = 'i.parent_id = ?', (parent['id'],)
+    else:
+        where, params = 'i.structure_id = ? AND i.parent_id IS NULL', (structure_id,)
+    
+    rows = conn.execute(f'''
+        SELECT i.*, (SELECT COUNT(*) FROM job_structure_items c WHERE c.parent_id = i.id) AS child_count
+        FROM job_structure_items i
+        WHERE {where}
+        ORDER BY i.sort_key
+    ''', params).fetchall()
+    
+    folder_path, separator = _get_structure_root(conn, structure_id)
+    result = []
+    for row in rows:
+        item = structure_item_to_dict(row, folder_path, separator)
+        item['id'] = row['id']
+        if row['type'] == 'folder':
+            item['child_count'] = row['child_count']
+            item['file_count'] = row['file_count']
+            item['total_size'] = row['total_size']
+        result.append(item)
+    return result
+
+def get_structure_subtree(conn, structure_id, path):
+    """Get a folder and everything below it in scan order, or None if the folder doesn't exist"""
+    folder = conn.execute(
+        'SELECT sort_key FROM job_structure_items WHERE structure_id = ? AND path = ?',
+        (structure_id, path)
+    ).fetchone()
+    if folder is None:
+        return None
+    
+    rows = conn.execute('''
+        SELECT * FROM job_structure_items
+        WHERE structure_id = ? AND (sort_key = ? OR (sort_key > ? AND sort_key < ?))
+        ORDER BY sort_key
+    ''', (structure_id, folder['sort_key'], folder['sort_key'] + '\x01', folder['sort_key'] + '\x02')).fetchall()
+    folder_path, separator = _get_structure_root(conn, structure_id)
+    return [structure_item_to_dict(row, folder_path, separator) for row in rows]
+
+def insert_structure_items(conn, structure_id, items, parents=None):
+    """
+    Insert structure items (dicts or StructureItem objects) for a structure
+    
+    Items must be in scan order so every folder is inserted before its
+    contents. Parents that already exist in the table are looked up by path,
+    unless they are in ``parents``, a path -> (id, sort_key) dict of inserted
+    folders that callers inserting one structure in batches can pass to every
+    call. Does not commit.
+    """
+    if parents is None:
+        parents = {}
+    
+    # full_path is left NULL whenever it can be rebuilt from folder_path
+    folder_path, separator = _get_structure_root(conn, structure_id)
+    
+    for item in items:
+        if not isinstance(item, dict):
+            item = item.to_dict()  # StructureItem from a scan
+        parent_path = _parent_path(item['path'], item['name'])
+        parent_id, sort_key = None, item['name']
+        
+        if parent_path:
+            parent = parents.get(parent_path)
+            if parent is None:
+                parent = conn.execute(
+                    'SELECT id, sort_key FROM job_structure_items WHERE structure_id = ? AND path = ?',
+                    (structure_id, parent_path)
+                ).fetchone()
+            if parent is not None:
+                parent_id = parent[0]
+                sort_key = parent[1] + '\x01' + item['name']
+        
+        full_path = item.get('full_path')
+        if separator is not None and full_path == join_structure_path(folder_path, item['path'], separator):
+            full_path = None
+        
+        cursor = conn.execute('''
+            INSERT INTO job_structure_items
+                (structure_id, parent_id, type, name, path, full_path, sort_key,
+                 alias, included, applications, collapsed, size)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            structure_id, parent_id, item['type'], item['name'], item['path'],
+            full_path, sort_key, item.get('alias', item['name']),
+            item.get('included', True), item.get('applications', ''),
+            item.get('collapsed', False), item.get('size')
+        ))
+        
+        if item['type'] == 'folder':
+            parents[item['path']] = (cursor.lastrowid, sort_key)
+
+def update_structure_items(conn, structure_id, updates):
+    """
+    Update editable fields of individual items
+    
+    Args:
+        updates (list): (path, field, value) tuples; field must be one of
+            STRUCTURE_ITEM_FIELDS
+    
+    Returns the number of rows changed. Does not commit.
+    """
+    by_field = {}
+    for path, field, value in updates:
+        if field not in STRUCTURE_ITEM_FIELDS:
+            raise ValueError(f'Field cannot be edited: {field}')
+        by_field.setdefault(field, []).append((value, structure_id, path))
+    
+    changed = 0
+    for field, params in by_field.items():
+        cursor = conn.executemany(
+            f'UPDATE job_structure_items SET {field} = ? WHERE structure_id = ? AND path = ?',
+            params
+        )
+        changed += cursor.rowcount
+    return changed
+
+def delete_structure_items(conn, structure_id, paths=None):
+    """Delete the given items of a structure, or all of them. Does not commit."""
+    if paths is None:
+        conn.execute('DELETE FROM job_structure_items WHERE structure_id = ?', (structure_id,))
+    else:
+        conn.executemany(
+            'DELETE FROM job_structure_items WHERE structure_id = ? AND path = ?',
+            ((structure_id, path) for path in paths)
+        )
+
+def remove_structure(conn, structure_id):
+    """Delete a structure with its items, statistics and scan index. Does not commit."""
+    delete_structure_items(conn, structure_id)
+    delete_structure_stats(conn, structure_id)
+    conn.execute('DELETE FROM job_structure_scan_index WHERE structure_id = ?', (structure_id,))
+    conn.execute('DELETE FROM job_structure_settings WHERE id = ?', (structure_id,))
+
+def delete_pending_structures(conn):
+    """Delete structures left half saved by a streamed scan that never finished"""
+    structures = conn.execute('SELECT id FROM job_structure_settings WHERE scan_pending = 1').fetchall()
+    
+    for structure in structures:
+        remove_structure(conn, structure['id'])
+        print(f"Deleted structure {structure['id']} left by an unfinished scan")
+
+def migrate_structure_data_blobs(conn):
+    """Move structures still stored as a structure_data JSON blob into job_structure_items"""
+    structures = conn.execute(
+        "SELECT id, structure_data FROM job_structure_settings WHERE structure_data != '[]'"
+    ).fetchall()
+    
+    for structure in structures:
+        try:
+            items = json.loads(structure['structure_data'])
+        except ValueError as e:
+            print(f"Skipping structure {structure['id']}: invalid structure_data ({e})")
+            continue
+        
+        delete_structure_items(conn, structure['id'])
+        insert_structure_items(conn, structure['id'], items)
+        refresh_structure_stats(conn, structure['id'])
+        conn.execute(
+            "UPDATE job_structure_settings SET structure_data = '[]' WHERE id = ?",
+            (structure['id'],)
+        )
+        print(f"Migrated structure {structure['id']} ({len(items)} items) to job_structure_items")
+
+def record_path_separators(conn):
+    """
+    Record the path separator of structures saved before it was stored
+    
+    Any nested item's path is its parent's path, the separator and its name,
+    so the separator is read off the first one. Structures without nested
+    items fall back to the separator their folder_path uses.
+    """
+    structures = conn.execute(
+        'SELECT id, folder_path FROM job_structure_settings WHERE path_separator IS NULL'
+    ).fetchall()
+    
+    for structure in structures:
+        item = conn.execute('''
+            SELECT path, name FROM job_structure_items
+            WHERE structure_id = ? AND parent_id IS NOT NULL
+            LIMIT 1
+        ''', (structure['id'],)).fetchone()
+        if item is not None:
+            separator = item['path'][-len(item['name']) - 1]
+        elif '\\' in structure['folder_path']:
+            separator = '\\'
+        elif '/' in structure['folder_path']:
+            separator = '/'
+        else:
+            separator = os.sep
+        conn.execute('UPDATE job_structure_settings SET path_separator = ? WHERE id = ?', (separator, structure['id']))
+
+def compact_structure_full_paths(conn):
+    """Drop stored full paths that can be rebuilt from the structure's folder_path"""
+    structures = conn.execute(
+        'SELECT id, folder_path, path_separator FROM job_structure_settings WHERE path_separator IS NOT NULL'
+    ).fetchall()
+    
+    for structure in structures:
+        prefix = join_structure_path(structure['folder_path'], '', structure['path_separator'])
+        cursor = conn.execute('''
+            UPDATE job_structure_items SET full_path = NULL
+            WHERE structure_id = ? AND full_path IS NOT NULL AND full_path = ? || path
+        ''', (structure['id'], prefix))
+        if cursor.rowcount:
+            print(f"Compacted {cursor.rowcount} stored full paths of structure {structure['id']}")
+
+def refresh_structure_stats(conn, structure_id):
+    """
+    Recompute the materialized statistics of a structure from its items
+    
+    Sets every folder's recursive file_count and total_size and rewrites the
+    structure's totals and extension histogram. Reads the items once in
+    reverse scan order, which reaches every item after everything below it.
+    Call after the items change on disk (scan, rescan). Does not commit.
+    """
+    folder_totals = {}  # folder id -> [file_count, total_size] seen so far
+    folder_updates = []
+    extensions = {}
+    folder_count = file_count = total_size = 0
+    
+    rows = conn.execute('''
+        SELECT id, parent_id, type, name, size FROM job_structure_items
+        WHERE structure_id = ?
+        ORDER BY sort_key DESC
+    ''', (structure_id,)).fetchall()
+    
+    for row in rows:
+        if row['type'] == 'folder':
+            files, size = folder_totals.pop(row['id'], (0, 0))
+            folder_updates.append((files, size, row['id']))
+            folder_count += 1
+        else:
+            files, size = 1, row['size'] or 0
+            histogram = extensions.setdefault(os.path.splitext(row['name'])[1].lower(), [0, 0])
+            histogram[0] += 1
+            histogram[1] += size
+            file_count += 1
+            total_size += size
+        
+        if row['parent_id'] is not None:
+            totals = folder_totals.setdefault(row['parent_id'], [0, 0])
+            totals[0] += files
+            totals[1] += size
+    
+    conn.executemany('UPDATE job_structure_items SET file_count = ?, total_size = ? WHERE id = ?', folder_updates)
+    conn.execute('DELETE FROM job_structure_extension_stats WHERE structure_id = ?', (structure_id,))
+    conn.executemany(
+        'INSERT INTO job_structure_extension_stats (structure_id, extension, file_count, total_size) VALUES (?, ?, ?, ?)',
+        ((structure_id, extension, files, size) for extension, (files, size) in extensions.items())
+    )
+    conn.execute('''
+        INSERT OR REPLACE INTO job_structure_stats (structure_id, folder_count, file_count, total_size, updated_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (structure_id, folder_count, file_count, total_size))
+
+def get_structure_stats(conn, structure_id):
+    """Get the materialized totals and extension histogram of a structure, or None"""
+    stats = conn.execute('SELECT * FROM job_structure_stats WHERE structure_id = ?', (structure_id,)).fetchone()
+    if stats is None:
+        return None
+    
+    extensions = conn.execute('''
+        SELECT extension, file_count, total_size FROM job_structure_extension_stats
+        WHERE structure_id = ?
+        ORDER BY file_count DESC, extension
+    ''', (structure_id,)).fetchall()
+    
+    return {
+        'folder_count': stats['folder_count'],
+        'file_count': stats['file_count'],
+        'total_size': stats['total_size'],
+        'extensions': [dict(extension) for extension in extensions],
+        'updated_at': stats['updated_at']
+    }
+
+def delete_structure_stats(conn, structure_id):
+    """Delete the materialized statistics of a structure. Does not commit."""
+    conn.execute('DELETE FROM job_structure_extension_stats WHERE structure_id = ?', (structure_id,))
+    conn.execute('DELETE FROM job_structure_stats WHERE structure_id = ?', (structure_id,))
+
+def materialize_structure_stats(conn):
+    """Compute statistics for structures saved before they were materialized"""
+    structures = conn.execute('''
+        SELECT id FROM job_structure_settings
+        WHERE id NOT IN (SELECT structure_id FROM job_structure_stats)
+    ''').fetchall()
+    
+    for structure in structures:
+        refresh_structure_stats(conn, structure['id'])
+    if structures:
+        print(f"Computed statistics of {len(structures)} structures")
+
+# Search relevance weights of the name, alias, path and applications columns
+SEARCH_COLUMN_WEIGHTS = (10.0, 5.0, 1.0, 2.0)
+
+def build_search_query(text):
+    """
+    Turn user search text into an FTS5 query, or None if it has no terms
+    
+    Terms are ANDed. "Quoted text" is matched as a phrase and a trailing *
+    makes a term a prefix; everything else is quoted, so FTS5 operators and
+    punctuation in file names (35394-FLOW.dwg) are just text.
+    """
+    terms = []
+    for match in re.finditer(r'"([^"]*)"|(\S+)', text):
+        phrase, word = match.groups()
+        if phrase is not None:
+            if phrase.strip():
+                terms.append('"' + phrase + '"')
+            continue
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append('"' + word + '"' + ('*' if prefix else ''))
+    return ' '.join(terms) or None
+
+def search_structure_items(conn, query, structure_id=None, item_type=None, limit=50, offset=0):
+    """
+    Search items of every structure (or one) through the full-text index
+    
+    Results are ranked by bm25 with SEARCH_COLUMN_WEIGHTS, best first, and
+    are item dicts with the structure's id and customer name and the score.
+    Raises sqlite3.OperationalError for a query FTS5 can't parse.
+    """
+    where = ['job_structure_search MATCH ?', 's.scan_pending = 0']
+    params = [query]
+    if structure_id is not None:
+        where.append('i.structure_id = ?')
+        params.append(structure_id)
+    if item_type is not None:
+        where.append('i.type = ?')
+        params.append(item_type)
+    
+    weights = ', '.join(str(weight) for weight in SEARCH_COLUMN_WEIGHTS)
+    rows = conn.execute(f'''
+        SELECT i.*, s.customer_name, s.folder_path, s.path_separator, bm25(job_structure_search, {weights}) AS score
+        FROM job_structure_search
+        JOIN job_structure_items i ON i.id = job_structure_search.rowid
+        JOIN job_structure_settings s ON s.id = i.structure_id
+        WHERE {' AND '.join(where)}
+        ORDER BY score
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset]).fetchall()
+    
+    results = []
+    for row in rows:
+        item = structure_item_to_dict(row, row['folder_path'], row['path_separator'])
+        item.pop('children', None)
+        item['structure_id'] = row['structure_id']
+        item['customer_name'] = row['customer_name']
+        item['score'] = row['score']
+        results.append(item)
+    return results
+
 # Naming Conditions Database Functions
 def save_naming_condition(condition_type, pattern, replacement, chains=None, enabled=True):
     """Save a naming condition to the database"""
-    conn = get_db_connection()
+    conn = get_db()
     try:
         cursor = conn.execute('''
             INSERT INTO naming_conditions (condition_type, pattern, replacement, chains, enabled)
             VALUES (?, ?, ?, ?, ?)
         ''', (condition_type, pattern, replacement, json.dumps(chains) if chains else None, enabled))
         conn.commit()
+        clear_alias_cache()
         return cursor.lastrowid
     except Exception as e:
         print(f"Error saving naming condition: {e}")
         return None
-    finally:
-        conn.close()
 
 def get_naming_conditions():
     """Get all naming conditions from the database"""
-    conn = get_db_connection()
+    conn = get_db()
     try:
         conditions = conn.execute('''
-            SELECT id, condition_type, pattern, replacement, chains, enabled, created_at
+            SELECT id, condition_type, pattern, replacement, chains, enabled, disabled_reason, created_at, updated_at
             FROM naming_conditions
             ORDER BY created_at DESC
         ''').fetchall()
@@ -177,7 +850,9 @@ def get_naming_conditions():
                 'pattern': condition['pattern'],
                 'replacement': condition['replacement'],
                 'enabled': bool(condition['enabled']),
-                'created_at': condition['created_at']
+                'disabled_reason': condition['disabled_reason'],
+                'created_at': condition['created_at'],
+                'updated_at': condition['updated_at']
             }
             
             if condition['chains']:
@@ -194,12 +869,10 @@ def get_naming_conditions():
     except Exception as e:
         print(f"Error getting naming conditions: {e}")
         return []
-    finally:
-        conn.close()
 
 def update_naming_condition(condition_id, condition_type=None, pattern=None, replacement=None, chains=None, enabled=None):
     """Update a naming condition in the database"""
-    conn = get_db_connection()
+    conn = get_db()
     try:
         updates = []
         params = []
@@ -225,206 +898,46 @@ def update_naming_condition(condition_id, condition_type=None, pattern=None, rep
             params.append(enabled)
         
         if updates:
+            # Editing or re-enabling a condition clears why it was disabled
+            if enabled or pattern is not None or condition_type is not None or chains is not None:
+                updates.append("disabled_reason = NULL")
             updates.append("updated_at = CURRENT_TIMESTAMP")
             params.append(condition_id)
             
             query = f"UPDATE naming_conditions SET {', '.join(updates)} WHERE id = ?"
             conn.execute(query, params)
             conn.commit()
+            clear_alias_cache()
             return True
         
         return False
     except Exception as e:
         print(f"Error updating naming condition: {e}")
         return False
-    finally:
-        conn.close()
+
+def disable_naming_condition(condition_id, reason):
+    """Disable a naming condition and record why"""
+    conn = get_db()
+    try:
+        conn.execute('''
+            UPDATE naming_conditions SET enabled = 0, disabled_reason = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (reason, condition_id))
+        conn.commit()
+        clear_alias_cache()
+        return True
+    except Exception as e:
+        print(f"Error disabling naming condition: {e}")
+        return False
 
 def delete_naming_condition(condition_id):
     """Delete a naming condition from the database"""
-    conn = get_db_connection()
+    conn = get_db()
     try:
         conn.execute('DELETE FROM naming_conditions WHERE id = ?', (condition_id,))
         conn.commit()
+        clear_alias_cache()
         return True
     except Exception as e:
         print(f"Error deleting naming condition: {e}")
         return False
-    finally:
-        conn.close()
-
-def apply_naming_conditions_to_structure(structure_data, conditions):
-    """Apply naming conditions to structure data"""
-    import re
-    
-    def apply_condition_to_item(item, condition):
-        """Apply a single condition to an item"""
-        name = item['name']
-        pattern = condition['pattern']
-        replacement = condition['replacement']
-        condition_type = condition['type']
-        chains = condition.get('chains', [])
-        
-        # Check if condition matches (including chains)
-        if matches_condition_with_chains(name, pattern, condition_type, chains):
-            return apply_replacement(name, pattern, replacement, condition_type)
-        return name
-    
-    def matches_condition_with_chains(name, pattern, condition_type, chains):
-        """Check if a name matches a condition with chained conditions"""
-        # Check main condition
-        main_match = matches_condition(name, pattern, condition_type)
-        
-        # If no chains, return main match
-        if not chains:
-            return main_match
-        
-        # Evaluate chains
-        result = main_match
-        
-        for chain in chains:
-            chain_match = matches_condition(name, chain['pattern'], chain['type'])
-            operator = chain.get('operator', 'AND')
-            
-            if operator == 'AND':
-                result = result and chain_match
-            elif operator == 'OR':
-                result = result or chain_match
-        
-        return result
-    
-    def matches_condition(name, pattern, condition_type):
-        """Check if a name matches a condition"""
-        if condition_type == 'contains':
-            return pattern in name
-        elif condition_type == 'startswith':
-            return name.startswith(pattern)
-        elif condition_type == 'endswith':
-            return name.endswith(pattern)
-        elif condition_type == 'equals':
-            return name == pattern
-        elif condition_type == 'regex':
-            try:
-                return bool(re.search(pattern, name))
-            except re.error:
-                return False
-        elif condition_type == 'intuitive':
-            # Convert intuitive patterns to regex and test
-            intuitive_regex = convert_intuitive_pattern(pattern)
-            return bool(intuitive_regex.search(name))
-        elif condition_type == 'extract_job_number':
-            return bool(re.search(r'\d{5}', name))
-        elif condition_type == 'extract_customer':
-            return bool(re.search(r'[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*', name))
-        elif condition_type == 'extract_date':
-            return bool(re.search(r'\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}|\d{4}[/\-]\d{1,2}[/\-]\d{1,2}', name))
-        else:
-            return pattern in name
-    
-    def convert_intuitive_pattern(pattern):
-        """Convert intuitive patterns to regex"""
-        regex_pattern = pattern
-        regex_pattern = re.sub(r'\{d(\d+)\}', r'(\\d{\1})', regex_pattern)
-        regex_pattern = re.sub(r'\{customer\}', r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', regex_pattern)
-        regex_pattern = re.sub(r'\{date\}', r'(\\d{1,2}[/\\-]\\d{1,2}[/\\-]\\d{2,4}|\\d{4}[/\\-]\\d{1,2}[/\\-]\\d{1,2})', regex_pattern)
-        regex_pattern = re.sub(r'\{word\}', r'(\\w+)', regex_pattern)
-        regex_pattern = re.sub(r'\{text\}', r'(.+)', regex_pattern)
-        return re.compile(regex_pattern)
-    
-    def apply_replacement(name, pattern, replacement, condition_type):
-        """Apply replacement based on condition type"""
-        if condition_type == 'contains':
-            return name.replace(pattern, replacement)
-        elif condition_type == 'startswith':
-            return name.replace(pattern, replacement) if name.startswith(pattern) else name
-        elif condition_type == 'endswith':
-            return name.replace(pattern, replacement) if name.endswith(pattern) else name
-        elif condition_type == 'equals':
-            return replacement
-        elif condition_type == 'regex':
-            try:
-                return re.sub(pattern, replacement, name)
-            except re.error:
-                return name
-        elif condition_type == 'intuitive':
-            return apply_intuitive_replacement(name, pattern, replacement)
-        elif condition_type == 'extract_job_number':
-            job_match = re.search(r'\d{5}', name)
-            if job_match:
-                return replacement.replace('$1', job_match.group(0))
-            return name
-        elif condition_type == 'extract_customer':
-            customer_match = re.search(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)', name)
-            if customer_match:
-                return replacement.replace('$1', customer_match.group(1))
-            return name
-        elif condition_type == 'extract_date':
-            date_match = re.search(r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}|\d{4}[/\-]\d{1,2}[/\-]\d{1,2})', name)
-            if date_match:
-                return replacement.replace('$1', date_match.group(1))
-            return name
-        else:
-            return name.replace(pattern, replacement)
-    
-    def apply_intuitive_replacement(name, pattern, replacement):
-        """Apply intuitive pattern replacement"""
-        regex_pattern = pattern
-        captures = []
-        
-        def replace_digits(match):
-            digits = int(match.group(1))
-            captures.append({'type': 'digits', 'count': digits})
-            return f'(\\d{{{digits}}})'
-        
-        def replace_customer(match):
-            captures.append({'type': 'customer'})
-            return '([A-Z][a-z]+(?:\\s+[A-Z][a-z]+)*)'
-        
-        def replace_date(match):
-            captures.append({'type': 'date'})
-            return '(\\d{1,2}[/\\-]\\d{1,2}[/\\-]\\d{2,4}|\\d{4}[/\\-]\\d{1,2}[/\\-]\\d{1,2})'
-        
-        def replace_word(match):
-            captures.append({'type': 'word'})
-            return '(\\w+)'
-        
-        def replace_text(match):
-            captures.append({'type': 'text'})
-            return '(.+)'
-        
-        regex_pattern = re.sub(r'\{d(\d+)\}', replace_digits, regex_pattern)
-        regex_pattern = re.sub(r'\{customer\}', replace_customer, regex_pattern)
-        regex_pattern = re.sub(r'\{date\}', replace_date, regex_pattern)
-        regex_pattern = re.sub(r'\{word\}', replace_word, regex_pattern)
-        regex_pattern = re.sub(r'\{text\}', replace_text, regex_pattern)
-        
-        try:
-            regex = re.compile(regex_pattern)
-            match = regex.search(name)
-            
-            if match:
-                result = replacement
-                
-                for i, capture in enumerate(captures):
-                    value = match.group(i + 1)
-                    
-                    if capture['type'] == 'digits':
-                        result = re.sub(f"\\{{{capture['count']}\\}}", value, result)
-                    else:
-                        result = re.sub(f"\\{{{capture['type']}\\}}", value, result)
-                
-                return result
-        except re.error as e:
-            print(f'Invalid intuitive pattern: {pattern} - {e}')
-        
-        return name
-    
-    # Apply conditions to each item in the structure
-    for item in structure_data:
-        for condition in conditions:
-            if condition.get('enabled', True):
-                new_alias = apply_condition_to_item(item, condition)
-                if new_alias != item['name']:
-                    item['alias'] = new_alias
-    
-    return structure_data
@@ -0,0 +1,292 @@
+"""
+Directory Scanner
+Shared os.scandir based engine used by the job structure routes and the
+PythonScriptTools scanner script.
+"""
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+# Directory listings the parallel scanner may hold ahead of the caller, per worker
+READAHEAD_PER_WORKER = 4
+
+# A single scanned file or folder. ``size`` is None for folders.
+ScanEntry = namedtuple('ScanEntry', ['name', 'path', 'full_path', 'is_dir', 'size', 'mtime'])
+
+class StructureItem:
+    """
+    Compact in-memory form of one structure item
+
+    Scans keep one of these per entry instead of a ten-key dict, which
+    matters for trees with hundreds of thousands of entries. to_dict()
+    produces the dict form used by the API, the JSON output and the
+    structure_data blobs.
+    """
+
+    __slots__ = ('name', 'path', 'full_path', 'is_dir', 'size', 'alias', 'included', 'applications', 'collapsed')
+
+    def __init__(self, entry, alias=None):
+        self.name = entry.name
+        self.path = entry.path
+        self.full_path = entry.full_path
+        self.is_dir = entry.is_dir
+        self.size = entry.size
+        self.alias = entry.name if alias is None else alias
+        self.included = True  # Default to included
+        self.applications = ''  # Empty by default
+        self.collapsed = False  # Default to expanded
+
+    @property
+    def type(self):
+        return 'folder' if self.is_dir else 'file'
+
+    def to_dict(self):
+        """The item as the dict the API returns"""
+        if self.is_dir:
+            return {
+                'type': 'folder',
+                'name': self.name,
+                'path': self.path,
+                'full_path': self.full_path,
+                'included': self.included,
+                'alias': self.alias,
+                'applications': self.applications,
+                'collapsed': self.collapsed,
+                'children': []
+            }
+
+        file_name, file_ext = os.path.splitext(self.name)
+        return {
+            'type': 'file',
+            'name': self.name,
+            'file_name': file_name,
+            'file_extension': file_ext,
+            'path': self.path,
+            'full_path': self.full_path,
+            'included': self.included,
+            'alias': self.alias,
+            'applications': self.applications,
+            'size': self.size
+        }
+
+def _skip_permission_errors(error, path):
+    """Default error handler: skip directories we can't access"""
+    if not isinstance(error, PermissionError):
+        raise error
+
+def _read_directory(current_path, relative_path):
+    """
+    List one directory with os.scandir
+
+    Returns a tuple (entries, errors) where entries is the alphabetically
+    sorted list of ScanEntry objects and errors is a list of (error, path)
+    pairs. Errors are collected rather than raised so worker threads can hand
+    them back to the caller.
+    """
+    errors = []
+    try:
+        with os.scandir(current_path) as it:
+            dir_entries = list(it)
+    except OSError as e:
+        return [], [(e, current_path)]
+
+    dir_entries.sort(key=lambda entry: entry.name)  # Sort alphabetically
+
+    entries = []
+    for entry in dir_entries:
+        item_relative_path = os.path.join(relative_path, entry.name) if relative_path else entry.name
+        try:
+            is_dir = entry.is_dir()
+            stat = entry.stat()
+        except OSError as e:
+            errors.append((e, entry.path))
+            continue
+        size = None if is_dir else stat.st_size
+        entries.append(ScanEntry(entry.name, item_relative_path, entry.path, is_dir, size, stat.st_mtime))
+
+    return entries, errors
+
+def iter_directory_entries(root_path, onerror=None, workers=1, stats=None):
+    """
+    Walk a folder depth first and yield a ScanEntry for every file and folder
+
+    Entries in each directory are yielded in alphabetical order and a folder
+    is always yielded before its contents, matching the order of the original
+    recursive os.listdir scanner. File type and size come from the cached
+    DirEntry data, so each entry costs at most one stat call (none on
+    Windows, where scandir returns the stat data with the listing).
+
+    Args:
+        root_path (str): Path to the folder to scan
+        onerror (callable): Called as onerror(error, path) when a directory
+            or entry can't be read. Defaults to skipping PermissionError and
+            re-raising anything else.
+        workers (int): Number of threads listing directories concurrently.
+            1 scans on the calling thread.
+        stats (dict): Optional dict whose 'directories_listed' counter is
+            kept up to date as directories are consumed
+
+    Yields:
+        ScanEntry: One entry per file or folder below root_path
+    """
+    if onerror is None:
+        onerror = _skip_permission_errors
+    if stats is None:
+        stats = {}
+    stats.setdefault('directories_listed', 0)
+
+    if workers and workers > 1:
+        yield from _iter_parallel(root_path, onerror, workers, stats)
+        return
+
+    def list_directory(current_path, relative_path):
+        stats['directories_listed'] += 1
+        entries, errors = _read_directory(current_path, relative_path)
+        for error, path in errors:
+            onerror(error, path)
+        return iter(entries)
+
+    # Explicit stack of directory iterators so deep trees don't hit the
+    # recursion limit
+    stack = [list_directory(root_path, "")]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+
+        yield entry
+
+        if entry.is_dir:
+            stack.append(list_directory(entry.full_path, entry.path))
+
+def _iter_parallel(root_path, onerror, workers, stats):
+    """
+    Work-queue variant of iter_directory_entries
+
+    Every directory listing is a task on a bounded thread pool. The caller
+    keeps a frontier of directories it has seen but not listed, ordered so
+    the one it needs next is last, and submits from it whenever fewer than
+    workers * READAHEAD_PER_WORKER listings are waiting to be consumed. The
+    pool reads ahead of the caller, which consumes entries in the same depth
+    first, alphabetical order as the sequential scanner, but never by more
+    than that many listings however slow the caller is.
+    """
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scan')
+    readahead = workers * READAHEAD_PER_WORKER
+    submitted = {}  # relative path -> future of a listing not consumed yet
+    frontier = [(root_path, "")]
+
+    def fill():
+        while frontier and len(submitted) < readahead:
+            full_path, path = frontier.pop()
+            submitted[path] = executor.submit(_read_directory, full_path, path)
+
+    def consume(path):
+        future = submitted.pop(path, None)
+        if future is None:
+            # Read-ahead is full of later listings; this one is next in the frontier
+            full_path, path = frontier.pop()
+            future = executor.submit(_read_directory, full_path, path)
+        entries, errors = future.result()
+        stats['directories_listed'] += 1
+        for error, error_path in errors:
+            onerror(error, error_path)
+        frontier.extend((entry.full_path, entry.path) for entry in reversed(entries) if entry.is_dir)
+        fill()
+        return iter(entries)
+
+    try:
+        stack = [consume("")]
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+                continue
+
+            yield entry
+
+            if entry.is_dir:
+                stack.append(consume(entry.path))
+    finally:
+        # Drop queued listings if the caller stops early or an error escapes
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def iter_changed_entries(root_path, index, onerror=None, stats=None):
+    """
+    Incremental variant of iter_directory_entries driven by a previous scan
+
+    A directory whose mtime matches the one recorded in ``index`` has the same
+    set of children as last time, so it is not listed again: its files are
+    rebuilt from the index and only its subdirectories are stat'ed to see
+    whether they changed. Directories that are new or whose mtime changed are
+    listed with os.scandir as usual.
+
+    Args:
+        root_path (str): Path to the folder to scan
+        index (dict): Maps relative path ('' for the root) to an
+            (is_dir, size, mtime) tuple from the previous scan
+        onerror (callable): Same as for iter_directory_entries
+        stats (dict): Optional dict that receives 'directories_listed' and
+            'directories_reused' counters
+
+    Yields:
+        ScanEntry: One entry per file or folder below root_path, in the same
+        order as iter_directory_entries
+    """
+    if onerror is None:
+        onerror = _skip_permission_errors
+    if stats is None:
+        stats = {}
+    stats.setdefault('directories_listed', 0)
+    stats.setdefault('directories_reused', 0)
+
+    # Children of every indexed directory, by parent relative path
+    children_by_parent = {}
+    for path, (is_dir, size, mtime) in index.items():
+        if path:
+            children_by_parent.setdefault(os.path.dirname(path), []).append(path)
+
+    def list_directory(current_path, relative_path, mtime):
+        known = index.get(relative_path)
+        if known is None or not known[0] or known[2] != mtime:
+            stats['directories_listed'] += 1
+            entries, errors = _read_directory(current_path, relative_path)
+            for error, path in errors:
+                onerror(error, path)
+            return iter(entries)
+
+        stats['directories_reused'] += 1
+        entries = []
+        for path in children_by_parent.get(relative_path, []):
+            is_dir, size, child_mtime = index[path]
+            name = os.path.basename(path)
+            full_path = os.path.join(current_path, name)
+            if is_dir:
+                try:
+                    child_mtime = os.stat(full_path).st_mtime
+                except OSError as e:
+                    onerror(e, full_path)
+                    continue
+            entries.append(ScanEntry(name, path, full_path, is_dir, size, child_mtime))
+        entries.sort(key=lambda entry: entry.name)  # Sort alphabetically
+        return iter(entries)
+
+    try:
+        root_mtime = os.stat(root_path).st_mtime
+    except OSError as e:
+        onerror(e, root_path)
+        return
+
+    stack = [list_directory(root_path, "", root_mtime)]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+
+        yield entry
+
+        if entry.is_dir:
+            stack.append(list_directory(entry.full_path, entry.path, entry.mtime))
@@ -1,9 +1,14 @@
-const { app, BrowserWindow, Menu, shell } = require('electron');
+const { app, BrowserWindow, Menu, shell, dialog } = require('electron');
 const path = require('path');
 const { spawn } = require('child_process');
 
 let mainWindow;
 let flaskProcess;
+let backendUrl;
+
+// The backend prints this followed by JSON {host, port} once it is listening
+const READY_PREFIX = 'BACKEND_READY ';
+const BACKEND_START_TIMEOUT = 60000;
 
 function createWindow() {
   // Create the browser window
@@ -20,11 +25,21 @@ function createWindow() {
     title: 'Engineering/Drafting Tools'
   });
 
-  // Start Flask server
-  startFlaskServer();
-
-  // Load the Flask app
-  mainWindow.loadURL('http://127.0.0.1:5000');
+  // Load the Flask app once the backend reports it is ready; the window stays
+  // hidden until then so an unreachable server's error page is never shown
+  const window = mainWindow;
+  (backendUrl ? Promise.resolve(backendUrl) : startFlaskServer())
+    .then((url) => {
+      backendUrl = url;
+      if (!window.isDestroyed()) {
+        window.loadURL(url);
+      }
+    })
+    .catch((error) => {
+      console.error(`Backend failed to start: ${error.message}`);
+      dialog.showErrorBox('Engineering/Drafting Tools', `The backend failed to start.\n\n${error.message}`);
+      app.quit();
+    });
 
   // Show window when ready
   mainWindow.once('ready-to-show', () => {
@@ -42,6 +57,8 @@ function createWindow() {
     mainWindow = null;
     if (flaskProcess) {
       flaskProcess.kill();
+      flaskProcess = null;
+      backendUrl = null;
     }
   });
 
@@ -52,24 +69,84 @@ function createWindow() {
   });
 }
 
+function delay(ms) {
+  return new Promise((resolve) => setTimeout(resolve, ms));
+}
+
+// Poll the health endpoint with exponential backoff until it answers
+async function waitForBackend(url, deadline) {
+  let wait = 50;
+  while (Date.now() < deadline) {
+    try {
+      const response = await fetch(`${url}/api/health`);
+      if (response.ok) {
+        return url;
+      }
+    } catch (error) {
+      // Not listening yet
+    }
+    await delay(wait);
+    wait = Math.min(wait * 2, 1000);
+  }
+  throw new Error(`No response from ${url} after ${BACKEND_START_TIMEOUT / 1000}s`);
+}
+
+// Start the backend and resolve with its base URL once it is ready
 function startFlaskServer() {
   const pythonPath = process.platform === 'win32' ? 'python' : 'python3';
+  const development = process.env.NODE_ENV === 'development';
+  // Production mode: no debugger or reloader, multi-threaded server on a
+  // free port that the backend announces on stdout
+  const args = development ? ['app.py'] : ['app.py', '--production', '--port', '0'];
+  const deadline = Date.now() + BACKEND_START_TIMEOUT;
 
-  flaskProcess = spawn(pythonPath, ['app.py'], {
+  flaskProcess = spawn(pythonPath, args, {
     cwd: path.join(__dirname, '..'),
     stdio: 'pipe'
   });
 
-  flaskProcess.stdout.on('data', (data) => {
-    console.log(`Flask: ${data}`);
-  });
-
-  flaskProcess.stderr.on('data', (data) => {
-    console.error(`Flask Error: ${data}`);
-  });
-
-  flaskProcess.on('close', (code) => {
-    console.log(`Flask process exited with code ${code}`);
+  return new Promise((resolve, reject) => {
+    let settled = false;
+    let pending = '';
+
+    const settle = (promise) => {
+      if (!settled) {
+        settled = true;
+        promise.then(resolve, reject);
+      }
+    };
+
+    flaskProcess.stdout.on('data', (data) => {
+      console.log(`Flask: ${data}`);
+      pending += data.toString();
+      let newline;
+      while ((newline = pending.indexOf('\n')) !== -1) {
+        const line = pending.slice(0, newline).trim();
+        pending = pending.slice(newline + 1);
+        if (line.startsWith(READY_PREFIX)) {
+          const { host, port } = JSON.parse(line.slice(READY_PREFIX.length));
+          settle(waitForBackend(`http://${host}:${port}`, deadline));
+        }
+      }
+    });
+
+    flaskProcess.stderr.on('data', (data) => {
+      console.error(`Flask Error: ${data}`);
+    });
+
+    flaskProcess.on('error', (error) => {
+      settle(Promise.reject(error));
+    });
+
+    flaskProcess.on('close', (code) => {
+      console.log(`Flask process exited with code ${code}`);
+      settle(Promise.reject(new Error(`Flask process exited with code ${code}`)));
+    });
+
+    // The development server does not announce itself; poll its fixed port
+    if (development) {
+      settle(waitForBackend('http://127.0.0.1:5000', deadline));
+    }
   });
 }
 
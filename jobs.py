@@ -0,0 +1,158 @@
+"""
+Background Jobs
+Small in-process job runner for work that is too slow to do inside an HTTP
+request. Jobs run on a background thread pool and report progress that the
+routes expose through job status endpoints.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from database import rollback_thread_db
+
+MAX_RUNNING_JOBS = 2
+MAX_KEPT_JOBS = 100  # Finished jobs are forgotten oldest first past this
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=MAX_RUNNING_JOBS, thread_name_prefix='job')
+
+class JobCancelled(Exception):
+    """Raised inside a job function when the job has been cancelled"""
+
+class Job:
+    """State and progress of one background job"""
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'  # queued, running, completed, failed, cancelled
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0  # Bumped on every progress or status change
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def update(self, **progress):
+        """Merge progress counters into the job's progress"""
+        with self._lock:
+            self.progress.update(progress)
+            self._notify()
+
+    def set_status(self, status):
+        """Change the job's status and wake anyone waiting on it"""
+        with self._lock:
+            self.status = status
+            if status != 'running':
+                self.finished_at = time.time()
+            self._notify()
+
+    def _notify(self):
+        # Caller holds self._lock
+        self.version += 1
+        self._changed.notify_all()
+
+    def wait_for_change(self, version, timeout=None):
+        """Block until the job changes after ``version`` or timeout; returns the current version"""
+        with self._lock:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """Ask the job to stop; job functions see it through check_cancelled()"""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def to_dict(self):
+        """Snapshot of the job for JSON responses"""
+        with self._lock:
+            progress = dict(self.progress)
+
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': progress,
+            'result': self.result,
+            'error': self.error,
+            'elapsed_seconds': elapsed
+        }
+
+def _run_job(job, func, args, kwargs):
+    if job.cancel_requested:
+        job.set_status('cancelled')
+        return
+
+    job.started_at = time.time()
+    job.set_status('running')
+    try:
+        job.result = func(job, *args, **kwargs)
+        job.set_status('completed')
+    except JobCancelled:
+        # The thread's connection outlives the job; don't leave it holding
+        # the write lock with half a job's changes
+        rollback_thread_db()
+        job.set_status('cancelled')
+    except Exception as e:
+        print(f"Job {job.id} ({job.kind}) failed: {e}")
+        rollback_thread_db()
+        job.error = str(e)
+        job.set_status('failed')
+
+def submit_job(kind, func, *args, **kwargs):
+    """
+    Run func(job, *args, **kwargs) in the background
+
+    The function's return value becomes the job result. It can report
+    progress with job.update() and should call job.check_cancelled()
+    between steps.
+
+    Returns:
+        Job: The queued job
+    """
+    job = Job(kind)
+
+    with _jobs_lock:
+        _jobs[job.id] = job
+        # Forget the oldest finished jobs
+        for job_id in [job_id for job_id, old in _jobs.items() if old.finished][:max(0, len(_jobs) - MAX_KEPT_JOBS)]:
+            del _jobs[job_id]
+
+    _executor.submit(_run_job, job, func, args, kwargs)
+    return job
+
+def get_job(job_id):
+    """Get a job by id, or None if it is unknown or was forgotten"""
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def cancel_job(job_id):
+    """Cancel a job; returns False if the job is unknown"""
+    job = get_job(job_id)
+    if job is None:
+        return False
+    job.cancel()
+    return True
@@ -0,0 +1,779 @@
+"""
+Naming Conditions
+Rule engine shared by the job structure API, the database layer and the
+PythonScriptTools scanner. Conditions are compiled once into matcher and
+replacer functions so applying them never re-parses a pattern per item.
+"""
+
+import re
+import json
+import time
+import hashlib
+import functools
+import threading
+from collections import OrderedDict, deque
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+try:
+    import regex as regex_engine  # Optional; lets user patterns run with a timeout
+except ImportError:
+    regex_engine = None
+
+JOB_NUMBER_REGEX = re.compile(r'\d{5}')
+CUSTOMER_REGEX = re.compile(r'([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)')
+DATE_REGEX = re.compile(r'(\d{1,2}[/\-]\d{1,2}[/\-]\d{2,4}|\d{4}[/\-]\d{1,2}[/\-]\d{1,2})')
+
+# Intuitive placeholders and the regex each one expands to
+INTUITIVE_TOKEN_REGEX = re.compile(r'\{(d(\d+)|customer|date|word|text)\}')
+INTUITIVE_TOKEN_PATTERNS = {
+    'customer': CUSTOMER_REGEX.pattern,
+    'date': DATE_REGEX.pattern,
+    'word': r'(\w+)',
+    'text': r'(.+)'
+}
+
+NEGATED_CONDITION_TYPES = ('not_contains', 'not_startswith', 'not_endswith', 'not_equals')
+
+# Literal conditions that a ConditionIndex can look up instead of testing one by one
+LITERAL_CONDITION_TYPES = ('contains', 'startswith', 'endswith', 'equals')
+# Below this many contains patterns, testing each with `in` beats an automaton scan
+CONTAINS_AUTOMATON_THRESHOLD = 32
+
+# Regex based conditions whose patterns a ConditionIndex merges into one alternation
+REGEX_CONDITION_TYPES = ('regex', 'intuitive', 'extract_job_number', 'extract_customer', 'extract_date')
+REGEX_MERGE_CHUNK_SIZE = 16
+# Constructs that mean something else once a pattern is embedded in a bigger one
+# (group references and global inline flags)
+UNMERGEABLE_REGEX = re.compile(r'\\[1-9]|\\g<|\(\?P[<=]|\(\?\(|\(\?[aiLmsux-]+\)')
+
+# User supplied patterns whose evaluation is limited to EVALUATION_TIME_BUDGET.
+# They are never merged into ConditionIndex prefilters, which run untimed.
+GUARDED_CONDITION_TYPES = ('regex', 'intuitive')
+EVALUATION_TIME_BUDGET = 0.25  # CPU seconds one condition may spend on one name
+# Wall clock seconds after which the regex package aborts a match. Kept well
+# above the budget so time spent waiting for the GIL doesn't abort a cheap match.
+MATCH_TIMEOUT = 2.0
+REGEX_ERRORS = (re.error, regex_engine.error) if regex_engine else (re.error,)
+
+COMPILED_CONDITION_CACHE_SIZE = 256
+_compiled_condition_cache = OrderedDict()
+_compiled_condition_cache_lock = threading.Lock()
+
+# Resolved aliases by (name, rule set hash); the same file names recur across
+# hundreds of job folders
+ALIAS_CACHE_SIZE = 100000
+_alias_cache = OrderedDict()
+_alias_cache_lock = threading.Lock()
+_alias_cache_stats = {'hits': 0, 'misses': 0, 'clears': 0}
+_MISSING = object()
+
+def _never_matches(name):
+    return False
+
+@functools.lru_cache(maxsize=1024)
+def _compile_regex(pattern):
+    """Compile a user pattern, returning None if it is invalid"""
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        print(f'Invalid naming condition pattern: {pattern} - {e}')
+        return None
+
+class _TimedRegex:
+    """A user pattern compiled with the regex package, giving up after MATCH_TIMEOUT"""
+    
+    def __init__(self, compiled):
+        self._compiled = compiled
+        self.pattern = compiled.pattern
+    
+    def search(self, name):
+        # Raises TimeoutError once the budget is spent
+        return self._compiled.search(name, timeout=MATCH_TIMEOUT, concurrent=True)
+    
+    def sub(self, replacement, name):
+        return self._compiled.sub(replacement, name, timeout=MATCH_TIMEOUT, concurrent=True)
+
+@functools.lru_cache(maxsize=1024)
+def _compile_guarded_regex(pattern):
+    """
+    Compile a user pattern for a condition, returning None if it is invalid
+    
+    With the regex package installed the pattern's searches time out after
+    MATCH_TIMEOUT; without it this is the plain re pattern and a
+    runaway match can only be detected once it finishes.
+    """
+    compiled = _compile_regex(pattern)
+    if compiled is None or regex_engine is None:
+        return compiled
+    try:
+        return _TimedRegex(regex_engine.compile(pattern))
+    except regex_engine.error:
+        return compiled
+
+def compile_intuitive_pattern(pattern, guarded=False):
+    """
+    Convert an intuitive pattern such as '{d5} {customer}' to a regex
+    
+    Returns (regex, tokens) where tokens[i] is the text ('{5}', '{customer}',
+    ...) that capture group i + 1 replaces in the replacement string, or
+    (None, []) if the resulting regex is invalid. guarded compiles it with
+    _compile_guarded_regex.
+    """
+    tokens = []
+    
+    def expand(match):
+        if match.group(2):
+            tokens.append('{%s}' % match.group(2))
+            return '(\\d{%s})' % match.group(2)
+        tokens.append('{%s}' % match.group(1))
+        return INTUITIVE_TOKEN_PATTERNS[match.group(1)]
+    
+    compile_pattern = _compile_guarded_regex if guarded else _compile_regex
+    regex = compile_pattern(INTUITIVE_TOKEN_REGEX.sub(expand, pattern))
+    return (regex, tokens) if regex is not None else (None, [])
+
+def _token_shape(match):
+    # Placeholder regexes are trusted; what matters is whether the user's text
+    # around them repeats them, so each stands in as a single repeat
+    if match.group(2):
+        return '(\\d{%s})' % match.group(2)
+    return '(x+)'
+
+def _first_literal(parsed):
+    """The character a parsed regex must start with, or None if it isn't one literal"""
+    for op, av in parsed:
+        if op == sre_parse.LITERAL:
+            return av
+        if op == sre_parse.SUBPATTERN:
+            return _first_literal(av[-1])
+        return None
+    return None
+
+def _has_ambiguous_repeat(parsed, inside_repeat=False):
+    """
+    Check a parsed regex for a part an unbounded or long repeat can match in
+    more than one way: a variable-length repeat, or an alternation whose
+    alternatives don't start with distinct literal characters
+    """
+    for op, av in parsed:
+        if op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, high, body = av
+            if inside_repeat and low != high:
+                return True
+            if _has_ambiguous_repeat(body, inside_repeat or high == sre_parse.MAXREPEAT or high >= 10):
+                return True
+        elif op == sre_parse.SUBPATTERN:
+            if _has_ambiguous_repeat(av[-1], inside_repeat):
+                return True
+        elif op == sre_parse.BRANCH:
+            if inside_repeat:
+                first_literals = [_first_literal(branch) for branch in av[1]]
+                if None in first_literals or len(set(first_literals)) < len(first_literals):
+                    return True
+            if any(_has_ambiguous_repeat(branch, inside_repeat) for branch in av[1]):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _has_ambiguous_repeat(av[1], inside_repeat):
+                return True
+        # Atomic groups and possessive repeats never backtrack into their body
+    return False
+
+def check_pattern(condition_type, pattern):
+    """
+    Check that a regex or intuitive pattern is valid and safe to run
+    
+    Patterns that nest a variable-length repeat inside an unbounded or long
+    one, such as (a+)+, (\\w+\\s?)* or (.*?,){11}, or repeat an alternation
+    whose alternatives can match the same character, such as (a|a)* or
+    (.|\\s)*, can backtrack for exponentially (or very polynomially) long
+    on names they almost match, so they are rejected. Intuitive placeholders are checked as a single repeat,
+    so ({word} )+ is rejected but {d5} {customer} is not.
+    
+    Returns:
+        str: Why the pattern was rejected, or None if it is fine
+    """
+    if condition_type == 'regex':
+        regex_pattern = pattern
+    elif condition_type == 'intuitive':
+        if compile_intuitive_pattern(pattern)[0] is None:
+            return f'Invalid pattern {pattern!r}'
+        regex_pattern = INTUITIVE_TOKEN_REGEX.sub(_token_shape, pattern)
+    else:
+        return None
+    
+    try:
+        parsed = sre_parse.parse(regex_pattern)
+    except re.error as e:
+        return f'Invalid pattern {pattern!r}: {e}'
+    
+    if _has_ambiguous_repeat(parsed):
+        return (
+            f'Pattern {pattern!r} repeats a part that can match the same text in more '
+            'than one way, which can take exponential time on some names. Simplify it '
+            'or make the repeated part atomic with (?>...)'
+        )
+    return None
+
+def check_condition(condition):
+    """Run check_pattern on a condition and its chains, returning the first problem"""
+    for part in [condition] + list(condition.get('chains') or []):
+        error = check_pattern(part.get('type'), part.get('pattern', ''))
+        if error:
+            return error
+    return None
+
+def compile_matcher(condition_type, pattern):
+    """Compile a single condition (main or chain) to a name -> bool function"""
+    if condition_type == 'contains':
+        return lambda name: pattern in name
+    elif condition_type == 'startswith':
+        return lambda name: name.startswith(pattern)
+    elif condition_type == 'endswith':
+        return lambda name: name.endswith(pattern)
+    elif condition_type == 'equals':
+        return lambda name: name == pattern
+    elif condition_type == 'regex':
+        regex = _compile_guarded_regex(pattern)
+        return (lambda name: regex.search(name) is not None) if regex else _never_matches
+    elif condition_type == 'intuitive':
+        regex, tokens = compile_intuitive_pattern(pattern, guarded=True)
+        return (lambda name: regex.search(name) is not None) if regex else _never_matches
+    elif condition_type == 'extract_job_number':
+        return lambda name: JOB_NUMBER_REGEX.search(name) is not None
+    elif condition_type == 'extract_customer':
+        return lambda name: CUSTOMER_REGEX.search(name) is not None
+    elif condition_type == 'extract_date':
+        return lambda name: DATE_REGEX.search(name) is not None
+    elif condition_type == 'not_contains':
+        return lambda name: pattern not in name
+    elif condition_type == 'not_startswith':
+        return lambda name: not name.startswith(pattern)
+    elif condition_type == 'not_endswith':
+        return lambda name: not name.endswith(pattern)
+    elif condition_type == 'not_equals':
+        return lambda name: name != pattern
+    else:
+        return lambda name: pattern in name
+
+def matcher_regex(condition_type, pattern):
+    """The regex a regex based condition is matched with, or None"""
+    if condition_type == 'regex':
+        return _compile_regex(pattern)
+    elif condition_type == 'intuitive':
+        return compile_intuitive_pattern(pattern)[0]
+    elif condition_type == 'extract_job_number':
+        return JOB_NUMBER_REGEX
+    elif condition_type == 'extract_customer':
+        return CUSTOMER_REGEX
+    elif condition_type == 'extract_date':
+        return DATE_REGEX
+    return None
+
+def _merge_regexes(regexes):
+    """
+    Merge regexes into one alternation that matches wherever any of them does
+    
+    Returns None if the merged pattern doesn't compile.
+    """
+    pattern = '|'.join('(?:%s)' % regex.pattern for regex in regexes)
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return None
+
+def compile_replacer(condition_type, pattern, replacement):
+    """Compile the replacement of a condition to a name -> alias function"""
+    if condition_type == 'contains':
+        return lambda name: name.replace(pattern, replacement)
+    elif condition_type == 'startswith':
+        return lambda name: name.replace(pattern, replacement) if name.startswith(pattern) else name
+    elif condition_type == 'endswith':
+        return lambda name: name.replace(pattern, replacement) if name.endswith(pattern) else name
+    elif condition_type == 'equals':
+        return lambda name: replacement
+    elif condition_type == 'regex':
+        regex = _compile_guarded_regex(pattern)
+        if regex is None:
+            return lambda name: name
+        
+        def replace_regex(name):
+            try:
+                return regex.sub(replacement, name)
+            except REGEX_ERRORS:
+                return name
+        return replace_regex
+    elif condition_type == 'intuitive':
+        regex, tokens = compile_intuitive_pattern(pattern, guarded=True)
+        if regex is None:
+            return lambda name: name
+        
+        def replace_intuitive(name):
+            match = regex.search(name)
+            if not match:
+                return name
+            result = replacement
+            # Replace {5}, {customer}, etc. with actual values
+            for i, token in enumerate(tokens):
+                result = result.replace(token, match.group(i + 1))
+            return result
+        return replace_intuitive
+    elif condition_type in ('extract_job_number', 'extract_customer', 'extract_date'):
+        regex = {
+            'extract_job_number': JOB_NUMBER_REGEX,
+            'extract_customer': CUSTOMER_REGEX,
+            'extract_date': DATE_REGEX
+        }[condition_type]
+        
+        def replace_extracted(name):
+            match = regex.search(name)
+            return replacement.replace('$1', match.group(0)) if match else name
+        return replace_extracted
+    elif condition_type in NEGATED_CONDITION_TYPES:
+        return lambda name: replacement  # For "not" conditions, just use the replacement
+    else:
+        return lambda name: name.replace(pattern, replacement)
+
+class CompiledCondition:
+    """A naming condition, including its chains, compiled for repeated use"""
+    
+    def __init__(self, condition):
+        self.condition = condition
+        self.main_matcher = compile_matcher(condition['type'], condition['pattern'])
+        self.chain_matchers = [
+            (chain.get('operator', 'AND'), compile_matcher(chain['type'], chain['pattern']))
+            for chain in condition.get('chains') or []
+        ]
+        self.replacer = compile_replacer(condition['type'], condition['pattern'], condition['replacement'])
+        self.guarded = any(
+            part.get('type') in GUARDED_CONDITION_TYPES
+            for part in [condition] + list(condition.get('chains') or [])
+        )
+    
+    def matches(self, name):
+        """Check if a name matches the condition and its chains"""
+        result = self.main_matcher(name)
+        
+        for operator, matcher in self.chain_matchers:
+            if operator == 'AND':
+                result = result and matcher(name)
+            elif operator == 'OR':
+                result = result or matcher(name)
+        
+        return result
+    
+    def evaluate(self, name, disabled=None):
+        """
+        Return (matched, alias) for a name
+        
+        Conditions with user supplied regexes are limited to
+        EVALUATION_TIME_BUDGET of thread CPU time per name, so waiting on the
+        GIL doesn't count. With the regex package a runaway match is also
+        aborted after MATCH_TIMEOUT; otherwise it runs to the end before it
+        is caught. Either way the condition is recorded
+        in ``disabled`` (condition -> reason, owned by the caller's run) and
+        matches nothing for the rest of that run.
+        """
+        if disabled is None:
+            disabled = {}
+        if self in disabled:
+            return False, name
+        if not self.guarded:
+            if self.matches(name):
+                return True, self.replacer(name)
+            return False, name
+        
+        start = time.thread_time()
+        try:
+            matched = self.matches(name)
+            alias = self.replacer(name) if matched else name
+        except TimeoutError:
+            disabled[self] = f'Disabled after timing out on {name!r} (aborted after {MATCH_TIMEOUT}s)'
+            return False, name
+        elapsed = time.thread_time() - start
+        if elapsed > EVALUATION_TIME_BUDGET:
+            disabled[self] = (
+                f'Disabled after taking {elapsed:.2f}s on {name!r} '
+                f'(budget {EVALUATION_TIME_BUDGET}s per name)'
+            )
+            return False, name
+        return matched, alias
+    
+    def apply(self, name, disabled=None):
+        """Return the alias for a name, or the name itself if the condition doesn't match"""
+        return self.evaluate(name, disabled)[1]
+
+def _condition_source(condition):
+    """The fields that determine how a condition compiles"""
+    return (condition['type'], condition['pattern'], condition['replacement'], json.dumps(condition.get('chains') or []))
+
+def compile_naming_conditions(conditions):
+    """
+    Compile the enabled conditions of a rule set, in order
+    
+    Compiled conditions are kept in a bounded LRU cache keyed by condition id
+    and updated_at, so stored conditions are only compiled again after they
+    change.
+    """
+    compiled = []
+    
+    for condition in conditions:
+        if not condition.get('enabled', True):
+            continue
+        
+        if condition.get('id') is None:
+            compiled.append(CompiledCondition(condition))
+            continue
+        
+        key = (condition['id'], condition.get('updated_at'))
+        source = _condition_source(condition)
+        with _compiled_condition_cache_lock:
+            cached = _compiled_condition_cache.get(key)
+            if cached is not None and cached[0] == source:
+                _compiled_condition_cache.move_to_end(key)
+                compiled.append(cached[1])
+                continue
+        
+        compiled_condition = CompiledCondition(condition)
+        with _compiled_condition_cache_lock:
+            _compiled_condition_cache[key] = (source, compiled_condition)
+            _compiled_condition_cache.move_to_end(key)
+            while len(_compiled_condition_cache) > COMPILED_CONDITION_CACHE_SIZE:
+                _compiled_condition_cache.popitem(last=False)
+        compiled.append(compiled_condition)
+    
+    return compiled
+
+def resolve_alias(name, compiled_conditions):
+    """
+    Return the alias the rule set gives a name, or None if no condition changes it
+    
+    When several conditions match, the last one in the list that changes the
+    name wins, so the list is searched from the end and stops at the first hit.
+    """
+    disabled = {}
+    for compiled_condition in reversed(compiled_conditions):
+        new_alias = compiled_condition.apply(name, disabled)
+        if new_alias != name:
+            return new_alias
+    return None
+
+class _LiteralAutomaton:
+    """Aho-Corasick automaton finding every literal pattern contained in a name"""
+    
+    def __init__(self, patterns):
+        """patterns maps each literal to the condition positions that use it"""
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [()]
+        
+        for pattern, positions in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.output[state] += tuple(positions)
+        
+        # Breadth first, so every failure target is finished before it is used
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(char, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] += self.output[self.fail[next_state]]
+    
+    def search(self, text):
+        """Return the set of condition positions whose pattern occurs in text"""
+        goto, fail, output = self.goto, self.fail, self.output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+def ruleset_hash(compiled_conditions):
+    """Hash of everything that decides what a compiled rule set does, in order"""
+    sources = [_condition_source(compiled_condition.condition) for compiled_condition in compiled_conditions]
+    return hashlib.sha1(json.dumps(sources).encode('utf-8')).hexdigest()
+
+def clear_alias_cache():
+    """Forget all memoized aliases; called whenever naming conditions change"""
+    with _alias_cache_lock:
+        _alias_cache.clear()
+        _alias_cache_stats['clears'] += 1
+
+def alias_cache_stats():
+    """Hit/miss counters and size of the alias cache"""
+    with _alias_cache_lock:
+        stats = dict(_alias_cache_stats, size=len(_alias_cache), max_size=ALIAS_CACHE_SIZE)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else None
+    return stats
+
+class ConditionIndex:
+    """
+    Compiled rule set with prefilters for literal and regex conditions
+    
+    contains, startswith, endswith and equals conditions whose chains are all
+    AND can only match names that contain their literal, so they are looked
+    up by hash set (equals, prefixes, suffixes) or found in a single
+    Aho-Corasick scan of the name (contains) instead of being tested one by
+    one.
+    
+    extract_* conditions with AND-only chains are merged, a chunk at a time,
+    into alternation regexes. One search per chunk rules
+    out every condition in it for the usual name that matches none of them;
+    when a chunk does match, its conditions are evaluated one by one, because
+    the leftmost alternative that matches is not necessarily the condition
+    that wins. Patterns that use group references or global flags are never
+    merged, and neither are user supplied regex and intuitive patterns, since
+    a merged search can't be held to EVALUATION_TIME_BUDGET. Everything else
+    is still evaluated against every name.
+    
+    Conditions that go over budget are recorded in ``disabled`` for the life
+    of the index, and once any has, resolved aliases are no longer memoized.
+    """
+    
+    def __init__(self, compiled_conditions):
+        self.compiled_conditions = compiled_conditions
+        self.ruleset_hash = ruleset_hash(compiled_conditions)
+        self.disabled = {}
+        self.equals = {}
+        self.prefixes = {}
+        self.suffixes = {}
+        contains = {}
+        regexes = []
+        always = []
+        
+        for position, compiled_condition in enumerate(compiled_conditions):
+            condition = compiled_condition.condition
+            pattern = condition['pattern']
+            and_chains = all(chain.get('operator', 'AND') == 'AND' for chain in condition.get('chains') or [])
+            if condition['type'] in REGEX_CONDITION_TYPES and and_chains:
+                regex = matcher_regex(condition['type'], pattern)
+                if (regex is not None and condition['type'] not in GUARDED_CONDITION_TYPES
+                        and not UNMERGEABLE_REGEX.search(regex.pattern)):
+                    regexes.append((position, regex))
+                elif regex is not None:
+                    always.append(position)
+            elif not (condition['type'] in LITERAL_CONDITION_TYPES and pattern and and_chains):
+                always.append(position)
+            elif condition['type'] == 'equals':
+                self.equals.setdefault(pattern, []).append(position)
+            elif condition['type'] == 'startswith':
+                self.prefixes.setdefault(pattern, []).append(position)
+            elif condition['type'] == 'endswith':
+                self.suffixes.setdefault(pattern, []).append(position)
+            else:
+                contains.setdefault(pattern, []).append(position)
+        
+        self.automaton = None
+        if len(contains) >= CONTAINS_AUTOMATON_THRESHOLD:
+            self.automaton = _LiteralAutomaton(contains)
+        else:
+            always.extend(position for positions in contains.values() for position in positions)
+        
+        self.regex_chunks = []
+        for start in range(0, len(regexes), REGEX_MERGE_CHUNK_SIZE):
+            chunk = regexes[start:start + REGEX_MERGE_CHUNK_SIZE]
+            positions = [position for position, regex in chunk]
+            merged = _merge_regexes([regex for position, regex in chunk]) if len(chunk) > 1 else None
+            if merged is None:
+                always.extend(positions)
+            else:
+                self.regex_chunks.append((merged, positions))
+        
+        self.always = set(always)
+        self.always_reversed = sorted(always, reverse=True)
+        self.prefix_lengths = sorted({len(prefix) for prefix in self.prefixes})
+        self.suffix_lengths = sorted({len(suffix) for suffix in self.suffixes})
+    
+    def candidates(self, name):
+        """Positions of the conditions that could match a name, last first"""
+        found = set(self.equals.get(name, ()))
+        for length in self.prefix_lengths:
+            if length > len(name):
+                break
+            found.update(self.prefixes.get(name[:length], ()))
+        for length in self.suffix_lengths:
+            if length > len(name):
+                break
+            found.update(self.suffixes.get(name[-length:], ()))
+        if self.automaton is not None:
+            found.update(self.automaton.search(name))
+        for merged, positions in self.regex_chunks:
+            if merged.search(name):
+                found.update(positions)
+        
+        if not found:
+            return self.always_reversed
+        return sorted(found.union(self.always), reverse=True)
+    
+    def resolve(self, name):
+        """Same as resolve_alias, memoized and evaluating only the candidate conditions"""
+        key = (name, self.ruleset_hash)
+        with _alias_cache_lock:
+            alias = _alias_cache.get(key, _MISSING)
+            if alias is not _MISSING:
+                _alias_cache.move_to_end(key)
+                _alias_cache_stats['hits'] += 1
+                return alias
+            _alias_cache_stats['misses'] += 1
+        
+        alias = self._resolve(name)
+        if self.disabled:
+            # Computed without the disabled conditions; not what the rule set gives
+            return alias
+        with _alias_cache_lock:
+            _alias_cache[key] = alias
+            if len(_alias_cache) > ALIAS_CACHE_SIZE:
+                _alias_cache.popitem(last=False)
+        return alias
+    
+    def _resolve(self, name):
+        compiled_conditions = self.compiled_conditions
+        for position in self.candidates(name):
+            new_alias = compiled_conditions[position].apply(name, self.disabled)
+            if new_alias != name:
+                return new_alias
+        return None
+
+def apply_naming_conditions(name, conditions):
+    """Apply naming conditions to a single name, returning the name if none change it"""
+    alias = resolve_alias(name, compile_naming_conditions(conditions))
+    return name if alias is None else alias
+
+def apply_naming_conditions_to_structure(structure_data, conditions):
+    """Apply naming conditions to structure data"""
+    index = ConditionIndex(compile_naming_conditions(conditions))
+    
+    # Apply conditions to each item in the structure
+    for item in structure_data:
+        new_alias = index.resolve(item['name'])
+        if new_alias is not None:
+            item['alias'] = new_alias
+    
+    return structure_data
+
+def resolve_aliases(names, conditions):
+    """
+    Resolve aliases for a batch of names
+    
+    Returns a dict of name -> alias for the names the rule set changes.
+    """
+    return resolve_aliases_checked(names, conditions)[0]
+
+def resolve_aliases_checked(names, conditions):
+    """
+    Same as resolve_aliases, also reporting conditions that ran over budget
+    
+    Returns (aliases, disabled) where disabled maps the id of every stored
+    condition that exceeded EVALUATION_TIME_BUDGET to the reason. Kept at
+    module level so it can run in a worker process.
+    """
+    compiled_conditions = compile_naming_conditions(conditions)
+    index = ConditionIndex(compiled_conditions)
+    aliases = {}
+    for name in names:
+        alias = index.resolve(name)
+        if alias is not None:
+            aliases[name] = alias
+    return aliases, disabled_conditions(index.disabled)
+
+def disabled_conditions(disabled):
+    """Map condition id -> reason for the stored conditions in a run's disabled dict"""
+    return {
+        compiled_condition.condition['id']: reason
+        for compiled_condition, reason in disabled.items()
+        if compiled_condition.condition.get('id') is not None
+    }
+
+def profile_naming_conditions(name_counts, conditions, sample_size=5):
+    """
+    Dry-run a rule set and report what each condition would do
+    
+    Args:
+        name_counts (dict): Maps each distinct item name to how many items
+            carry it
+        conditions (list): Naming condition dictionaries
+        sample_size (int): Before/after examples kept per condition
+    
+    Returns:
+        dict: 'conditions' holds one report per enabled condition with its
+        match_count (items matched), changed_count (items whose alias it
+        would change), winning_count (items where it decides the final alias),
+        cpu_seconds (CPU time of this thread only) and samples;
+        'changed_count' is the total number of items the whole rule set would
+        rename.
+    """
+    compiled_conditions = compile_naming_conditions(conditions)
+    disabled = {}
+    reports = []
+    results = []
+    
+    for compiled_condition in compiled_conditions:
+        condition = compiled_condition.condition
+        match_count = 0
+        changed = {}
+        samples = []
+        
+        start = time.thread_time()
+        for name in name_counts:
+            matched, new_alias = compiled_condition.evaluate(name, disabled)
+            if matched:
+                match_count += name_counts[name]
+                if new_alias != name:
+                    changed[name] = new_alias
+        cpu_seconds = time.thread_time() - start
+        
+        for name, new_alias in changed.items():
+            if len(samples) >= sample_size:
+                break
+            samples.append({'name': name, 'alias': new_alias})
+        
+        results.append(changed)
+        reports.append({
+            'id': condition.get('id'),
+            'type': condition['type'],
+            'pattern': condition['pattern'],
+            'replacement': condition['replacement'],
+            'match_count': match_count,
+            'changed_count': sum(name_counts[name] for name in changed),
+            'winning_count': 0,
+            'cpu_seconds': cpu_seconds,
+            'samples': samples,
+            'disabled_reason': disabled.get(compiled_condition)
+        })
+    
+    # The last condition that changes a name decides its alias
+    changed_count = 0
+    for name, count in name_counts.items():
+        for report, changed in zip(reversed(reports), reversed(results)):
+            if name in changed:
+                report['winning_count'] += count
+                changed_count += count
+                break
+    
+    return {
+        'conditions': reports,
+        'changed_count': changed_count,
+        'disabled': disabled_conditions(disabled)
+    }
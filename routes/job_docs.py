@@ -1,9 +1,9 @@
 from flask import Blueprint, render_template, request, jsonify
 
-def get_db_connection():
-    """Get database connection - imported locally to avoid circular imports"""
-    from database import get_db_connection as _get_db_connection
-    return _get_db_connection()
+def get_db():
+    """Get the request's database connection - imported locally to avoid circular imports"""
+    from database import get_db as _get_db
+    return _get_db()
 
 job_docs_bp = Blueprint('job_docs', __name__)
 
@@ -25,18 +25,17 @@ def templates():
 
 @job_docs_bp.route('/api/projects')
 def get_projects():
-    conn = get_db_connection()
+    conn = get_db()
     projects = conn.execute(
         'SELECT * FROM projects ORDER BY created_at DESC'
     ).fetchall()
-    conn.close()
     
     return jsonify([dict(project) for project in projects])
 
 @job_docs_bp.route('/api/projects', methods=['POST'])
 def create_project():
     data = request.get_json()
-    conn = get_db_connection()
+    conn = get_db()
     
     conn.execute(
         'INSERT INTO projects (name, description, status, client) VALUES (?, ?, ?, ?)',
@@ -44,29 +43,26 @@ def create_project():
     )
     conn.commit()
     project_id = conn.lastrowid
-    conn.close()
     
     return jsonify({'id': project_id, 'message': 'Project created successfully'})
 
 @job_docs_bp.route('/api/projects/<int:project_id>', methods=['PUT'])
 def update_project(project_id):
     data = request.get_json()
-    conn = get_db_connection()
+    conn = get_db()
     
     conn.execute(
         'UPDATE projects SET name = ?, description = ?, status = ?, client = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
         (data['name'], data['description'], data['status'], data.get('client', ''), project_id)
     )
     conn.commit()
-    conn.close()
     
     return jsonify({'message': 'Project updated successfully'})
 
 @job_docs_bp.route('/api/projects/<int:project_id>', methods=['DELETE'])
 def delete_project(project_id):
-    conn = get_db_connection()
+    conn = get_db()
     conn.execute('DELETE FROM projects WHERE id = ?', (project_id,))
     conn.commit()
-    conn.close()
     
     return jsonify({'message': 'Project deleted successfully'})
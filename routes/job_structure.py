@@ -1,13 +1,27 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, Response, render_template, request, jsonify, current_app, stream_with_context
 import os
 import json
+import sqlite3
 import re
+import time
+import functools
 from datetime import datetime
+from concurrent.futures import as_completed
 from database import (
     save_naming_condition, get_naming_conditions, update_naming_condition, 
-    delete_naming_condition, apply_naming_conditions_to_structure
+    delete_naming_condition, disable_naming_condition,
+    get_structure_items, get_structure_items_compact, get_structure_children, get_structure_subtree, insert_structure_items,
+    update_structure_items, delete_structure_items, refresh_structure_stats, get_structure_stats,
+    remove_structure, build_search_query, search_structure_items, STRUCTURE_ITEM_FIELDS
 )
+from directory_scanner import iter_directory_entries, iter_changed_entries, StructureItem
+from naming_conditions import (
+    resolve_aliases_checked, profile_naming_conditions, check_condition,
+    alias_cache_stats, clear_alias_cache
+)
+from jobs import submit_job, get_job, cancel_job
 
+@functools.lru_cache(maxsize=100000)
 def generateSmartAlias(filename):
     """Generate a smart alias for a filename by removing common patterns"""
     # Remove common patterns
@@ -24,10 +38,28 @@ def generateSmartAlias(filename):
     
     return alias
 
-def get_db_connection():
-    """Get database connection - imported locally to avoid circular imports"""
-    from database import get_db_connection as _get_db_connection
-    return _get_db_connection()
+def get_db():
+    """Get the request's database connection - imported locally to avoid circular imports"""
+    from database import get_db as _get_db
+    return _get_db()
+
+def record_disabled_conditions(disabled):
+    """Disable stored conditions that ran over their time budget; only jobs that write call this"""
+    for condition_id, reason in disabled.items():
+        print(f"Disabling naming condition {condition_id}: {reason}")
+        disable_naming_condition(condition_id, reason)
+
+def check_posted_conditions(conditions):
+    """Run check_condition on conditions posted for a preview or dry run, returning the first problem"""
+    if not isinstance(conditions, list):
+        return 'conditions must be a list'
+    for condition in conditions:
+        if not isinstance(condition, dict):
+            return 'Each condition must be an object'
+        error = check_condition(condition)
+        if error:
+            return error
+    return None
 
 job_structure_bp = Blueprint('job_structure', __name__)
 
@@ -35,76 +67,365 @@ job_structure_bp = Blueprint('job_structure', __name__)
 def job_structure_home():
     return render_template('job_structure/index.html')
 
-@job_structure_bp.route('/api/scan-folder', methods=['POST'])
-def scan_folder():
-    """Scan a folder and return its structure"""
-    data = request.get_json()
+def validate_scan_request(data):
+    """
+    Check a scan request's folder path and customer name
+    
+    Returns (customer_name, folder_path, error) where error is None or the
+    message to send back with a 400.
+    """
     folder_path = data.get('folder_path')
     customer_name = data.get('customer_name', 'Unknown')
     
     if not folder_path:
-        return jsonify({'error': 'No folder path provided'}), 400
+        return customer_name, folder_path, 'No folder path provided'
     
     # Strip quotes and normalize the path
     folder_path = folder_path.strip('"\'')
     folder_path = os.path.normpath(folder_path)
     
     if not os.path.exists(folder_path):
-        return jsonify({'error': f'Folder does not exist: {folder_path}'}), 400
+        return customer_name, folder_path, f'Folder does not exist: {folder_path}'
     
     if not os.path.isdir(folder_path):
-        return jsonify({'error': f'Path is not a directory: {folder_path}'}), 400
+        return customer_name, folder_path, f'Path is not a directory: {folder_path}'
     
+    if structure_exists(get_db(), customer_name, folder_path):
+        return customer_name, folder_path, f'Structure already exists for {customer_name} at {folder_path}. Please delete the existing structure first.'
+    
+    return customer_name, folder_path, None
+
+def structure_exists(conn, customer_name, folder_path):
+    """Check if a structure already exists for this customer and folder"""
+    return conn.execute(
+        'SELECT id FROM job_structure_settings WHERE customer_name = ? AND folder_path = ?',
+        (customer_name, folder_path)
+    ).fetchone() is not None
+
+def save_scanned_structure(conn, customer_name, folder_path, structure, index):
+    """Save a freshly scanned structure and its scan index; returns the new structure id"""
+    cursor = conn.execute(
+        'INSERT INTO job_structure_settings (customer_name, folder_path, structure_data, path_separator, created_at) VALUES (?, ?, ?, ?, ?)',
+        (customer_name, folder_path, '[]', os.sep, datetime.now())
+    )
+    insert_structure_items(conn, cursor.lastrowid, structure)
+    refresh_structure_stats(conn, cursor.lastrowid)
+    save_scan_index(conn, cursor.lastrowid, index)
+    conn.commit()
+    return cursor.lastrowid
+
+STREAM_BATCH_SIZE = 500  # Items written to the database at a time while streaming a scan
+
+def stream_scan(conn, customer_name, folder_path, workers=1):
+    """
+    Scan a folder into a new structure, yielding NDJSON lines as it goes
+    
+    Each scanned item is written out as one JSON line as soon as the walker
+    yields it and saved in batches, so memory use doesn't grow with the size
+    of the tree. The last line is {"type": "done", "structure_id", "item_count"}
+    or {"type": "error", "error"}.
+    
+    Every batch is committed so the write lock isn't held for the whole walk.
+    Until the scan finishes the structure is marked scan_pending, which keeps
+    it out of listings and search, and it is deleted if the scan doesn't
+    finish (or at the next startup if the process dies).
+    """
+    cursor = conn.execute(
+        'INSERT INTO job_structure_settings (customer_name, folder_path, structure_data, scan_pending, path_separator, created_at) VALUES (?, ?, ?, 1, ?, ?)',
+        (customer_name, folder_path, '[]', os.sep, datetime.now())
+    )
+    structure_id = cursor.lastrowid
+    conn.commit()
+    parents = {}
+    items = []
+    index_rows = [(structure_id, '', True, None, os.stat(folder_path).st_mtime)]
+    item_count = 0
+    
+    def flush():
+        insert_structure_items(conn, structure_id, items, parents=parents)
+        conn.executemany(
+            'INSERT INTO job_structure_scan_index (structure_id, path, is_dir, size, mtime) VALUES (?, ?, ?, ?, ?)',
+            index_rows
+        )
+        conn.commit()
+        items.clear()
+        index_rows.clear()
+    
+    entries = iter_directory_entries(folder_path, workers=workers)
+    completed = False
     try:
-        # Check if structure already exists for this customer and folder
-        conn = get_db_connection()
-        existing = conn.execute(
-            'SELECT id FROM job_structure_settings WHERE customer_name = ? AND folder_path = ?',
-            (customer_name, folder_path)
-        ).fetchone()
-        
-        if existing:
-            conn.close()
-            return jsonify({'error': f'Structure already exists for {customer_name} at {folder_path}. Please delete the existing structure first.'}), 400
+        for entry in entries:
+            item = build_structure_item(entry)
+            items.append(item)
+            index_rows.append((structure_id, entry.path, entry.is_dir, entry.size, entry.mtime))
+            item_count += 1
+            yield json.dumps(item.to_dict()) + '\n'
+            
+            if len(items) >= STREAM_BATCH_SIZE:
+                flush()
         
+        flush()
+        refresh_structure_stats(conn, structure_id)
+        conn.execute('UPDATE job_structure_settings SET scan_pending = 0 WHERE id = ?', (structure_id,))
+        conn.commit()
+        completed = True
+        yield json.dumps({'type': 'done', 'structure_id': structure_id, 'item_count': item_count}) + '\n'
+    except Exception as e:
+        yield json.dumps({'type': 'error', 'error': str(e)}) + '\n'
+    finally:
+        # Also runs when the client disconnects mid-stream
+        entries.close()
+        if not completed:
+            conn.rollback()
+            remove_structure(conn, structure_id)
+            conn.commit()
+
+@job_structure_bp.route('/api/scan-folder', methods=['POST'])
+def scan_folder():
+    """
+    Scan a folder and return its structure
+    
+    With ?format=ndjson the items are streamed back one JSON object per line
+    while the scan runs (see stream_scan) instead of in one response.
+    """
+    customer_name, folder_path, error = validate_scan_request(request.get_json())
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if request.args.get('format') == 'ndjson':
+        scan = stream_scan(get_db(), customer_name, folder_path, workers=current_app.config.get('SCAN_WORKERS', 1))
+        return Response(stream_with_context(scan), mimetype='application/x-ndjson')
+    
+    try:
         # Call the Python script to scan the folder
-        structure = scan_directory_structure(folder_path)
+        index = {}
+        structure = scan_directory_structure(folder_path, workers=current_app.config.get('SCAN_WORKERS', 1), index=index)
         
         # Save to database
+        save_scanned_structure(get_db(), customer_name, folder_path, structure, index)
+        
+        return jsonify({'success': True, 'structure': [item.to_dict() for item in structure]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+SCAN_PROGRESS_INTERVAL = 0.25  # Seconds between progress updates of a scan job
+
+def run_scan_job(job, customer_name, folder_path, workers=1):
+    """
+    Background job: scan a folder and save it as a new structure
+    
+    Progress reports directories visited, files found and bytes seen. The
+    ETA assumes the directories found but not listed yet take as long on
+    average as the ones listed so far, so it grows while new directories
+    keep turning up.
+    """
+    counts = {'directories_found': 1, 'files_found': 0, 'bytes_seen': 0}
+    last_update = [0]
+    
+    def report_progress(entry, stats):
+        job.check_cancelled()
+        if entry.is_dir:
+            counts['directories_found'] += 1
+        else:
+            counts['files_found'] += 1
+            counts['bytes_seen'] += entry.size
+        
+        now = time.monotonic()
+        if now - last_update[0] < SCAN_PROGRESS_INTERVAL:
+            return
+        last_update[0] = now
+        
+        elapsed = time.time() - job.started_at
+        visited = stats['directories_listed']
+        eta = elapsed * (counts['directories_found'] - visited) / visited if visited else None
+        job.update(phase='scanning', directories_visited=visited, eta_seconds=eta, **counts)
+    
+    job.update(phase='scanning', directories_visited=0, eta_seconds=None, **counts)
+    index = {}
+    structure = scan_directory_structure(folder_path, workers=workers, index=index, on_entry=report_progress)
+    job.update(phase='saving', directories_visited=counts['directories_found'], eta_seconds=0, **counts)
+    
+    conn = get_db()
+    if structure_exists(conn, customer_name, folder_path):
+        raise ValueError(f'Structure already exists for {customer_name} at {folder_path}')
+    structure_id = save_scanned_structure(conn, customer_name, folder_path, structure, index)
+    
+    job.update(phase='done')
+    return {
+        'structure_id': structure_id,
+        'item_count': len(structure),
+        'message': f'Folder structure scanned successfully! Found {len(structure)} items.'
+    }
+
+@job_structure_bp.route('/api/scan-jobs', methods=['POST'])
+def start_scan_job():
+    """Start a background job scanning a folder into a new structure"""
+    customer_name, folder_path, error = validate_scan_request(request.get_json())
+    if error:
+        return jsonify({'success': False, 'error': error}), 400
+    
+    try:
+        job = submit_job(
+            'scan-folder', run_scan_job, customer_name, folder_path,
+            workers=current_app.config.get('SCAN_WORKERS', 1)
+        )
+        return jsonify({'success': True, 'job_id': job.id}), 202
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@job_structure_bp.route('/api/rescan-structure/<int:structure_id>', methods=['POST'])
+def rescan_structure(structure_id):
+    """Rescan a saved structure, listing only changed directories and keeping user edits"""
+    try:
+        conn = get_db()
+        structure = conn.execute(
+            'SELECT folder_path FROM job_structure_settings WHERE id = ?',
+            (structure_id,)
+        ).fetchone()
+        
+        if not structure:
+            return jsonify({'success': False, 'error': 'Structure not found'}), 404
+        
+        folder_path = structure['folder_path']
+        if not os.path.isdir(folder_path):
+            return jsonify({'success': False, 'error': f'Folder does not exist: {folder_path}'}), 400
+        
+        old_index = load_scan_index(conn, structure_id)
+        old_items = {item['path']: item for item in get_structure_items(conn, structure_id)}
+        
+        # Diff the fresh listing against the saved items; rows that still
+        # exist keep their included/alias/applications edits
+        stats = {}
+        index = {'': (True, None, os.stat(folder_path).st_mtime)}
+        added_items = []
+        resized_items = []
+        for entry in iter_changed_entries(folder_path, old_index, stats=stats):
+            item = old_items.get(entry.path)
+            if item is None or item['type'] != ('folder' if entry.is_dir else 'file'):
+                added_items.append(build_structure_item(entry))
+            else:
+                del old_items[entry.path]
+                if not entry.is_dir and item['size'] != entry.size:
+                    resized_items.append((entry.size, structure_id, entry.path))
+            index[entry.path] = (entry.is_dir, entry.size, entry.mtime)
+        
+        # Whatever is left in old_items no longer exists on disk
+        delete_structure_items(conn, structure_id, old_items.keys())
+        insert_structure_items(conn, structure_id, added_items)
+        conn.executemany(
+            'UPDATE job_structure_items SET size = ? WHERE structure_id = ? AND path = ?',
+            resized_items
+        )
+        refresh_structure_stats(conn, structure_id)
         conn.execute(
-            'INSERT INTO job_structure_settings (customer_name, folder_path, structure_data, created_at) VALUES (?, ?, ?, ?)',
-            (customer_name, folder_path, json.dumps(structure), datetime.now())
+            'UPDATE job_structure_settings SET updated_at = ? WHERE id = ?',
+            (datetime.now(), structure_id)
         )
+        save_scan_index(conn, structure_id, index)
         conn.commit()
-        conn.close()
+        new_structure = get_structure_items(conn, structure_id)
         
-        return jsonify({'success': True, 'structure': structure})
+        return jsonify({
+            'success': True,
+            'structure': new_structure,
+            'added_count': len(added_items),
+            'removed_count': len(old_items),
+            'directories_listed': stats['directories_listed'],
+            'directories_reused': stats['directories_reused']
+        })
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @job_structure_bp.route('/api/update-item', methods=['POST'])
 def update_item():
     """Update an item's settings (checkbox, alias, applications)"""
     data = request.get_json()
+    structure_id = data['structure_id']
     
-    conn = get_db_connection()
-    conn.execute(
-        'UPDATE job_structure_settings SET structure_data = ?, updated_at = ? WHERE id = ?',
-        (json.dumps(data['structure_data']), datetime.now(), data['structure_id'])
-    )
-    conn.commit()
-    conn.close()
+    conn = get_db()
+    
+    # Only write the rows whose editable fields actually changed
+    stored = {item['path']: item for item in get_structure_items(conn, structure_id)}
+    updates = []
+    for item in data['structure_data']:
+        current = stored.get(item.get('path'))
+        if current is None:
+            continue
+        for field in STRUCTURE_ITEM_FIELDS:
+            if field in item and item[field] != current.get(field):
+                updates.append((item['path'], field, item[field]))
+    
+    if updates:
+        update_structure_items(conn, structure_id, updates)
+        conn.execute(
+            'UPDATE job_structure_settings SET updated_at = ? WHERE id = ?',
+            (datetime.now(), structure_id)
+        )
+        conn.commit()
     
     return jsonify({'success': True})
 
+@job_structure_bp.route('/api/structures/<int:structure_id>/items', methods=['GET'])
+def get_items(structure_id):
+    """
+    Get every item of a structure
+    
+    Returned in the compact encoding (root recorded once, items as parent
+    index plus name) unless ?format=full asks for the item dicts.
+    ?path=<folder> limits the result to that folder and everything below
+    it, as item dicts.
+    """
+    conn = get_db()
+    if conn.execute('SELECT 1 FROM job_structure_settings WHERE id = ?', (structure_id,)).fetchone() is None:
+        return jsonify({'success': False, 'error': 'Structure not found'}), 404
+    
+    path = request.args.get('path')
+    if path:
+        items = get_structure_subtree(conn, structure_id, path)
+        if items is None:
+            return jsonify({'success': False, 'error': f'Folder not found: {path}'}), 404
+        return jsonify({'success': True, 'path': path, 'items': items})
+    
+    if request.args.get('format') == 'full':
+        return jsonify({'success': True, 'items': get_structure_items(conn, structure_id)})
+    return jsonify({'success': True, 'structure': get_structure_items_compact(conn, structure_id)})
+
+@job_structure_bp.route('/api/structures/<int:structure_id>/items', methods=['PATCH'])
+def patch_items(structure_id):
+    """Apply a batch of {path, field, value} edits to individual items"""
+    data = request.get_json() or {}
+    operations = data.get('operations')
+    
+    if not isinstance(operations, list):
+        return jsonify({'success': False, 'error': 'operations must be a list'}), 400
+    
+    try:
+        updates = [(op['path'], op['field'], op['value']) for op in operations]
+    except (KeyError, TypeError):
+        return jsonify({'success': False, 'error': 'Each operation needs path, field and value'}), 400
+    
+    conn = get_db()
+    try:
+        updated_count = update_structure_items(conn, structure_id, updates)
+        if updated_count:
+            conn.execute(
+                'UPDATE job_structure_settings SET updated_at = ? WHERE id = ?',
+                (datetime.now(), structure_id)
+            )
+        conn.commit()
+    except ValueError as e:
+        conn.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    return jsonify({'success': True, 'updated_count': updated_count})
+
 @job_structure_bp.route('/api/get-structures')
 def get_structures():
     """Get all saved structures"""
-    conn = get_db_connection()
+    conn = get_db()
     structures = conn.execute(
-        'SELECT * FROM job_structure_settings ORDER BY created_at DESC'
+        'SELECT * FROM job_structure_settings WHERE scan_pending = 0 ORDER BY created_at DESC'
     ).fetchall()
-    conn.close()
     
     result = []
     for structure in structures:
@@ -112,74 +433,194 @@ def get_structures():
             'id': structure['id'],
             'customer_name': structure['customer_name'],
             'folder_path': structure['folder_path'],
-            'structure_data': json.loads(structure['structure_data']),
+            'structure_data': get_structure_items(conn, structure['id']),
             'created_at': structure['created_at']
         })
     
     return jsonify(result)
 
+@job_structure_bp.route('/api/structures')
+def list_structures():
+    """
+    List structure summaries (no tree), newest first, with cursor pagination
+    
+    Counts and sizes come from the statistics materialized at scan time, so
+    the cost doesn't depend on how big the structures are.
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        cursor = request.args.get('cursor', type=int)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be a number'}), 400
+    
+    conn = get_db()
+    query = '''
+        SELECT s.*, st.folder_count, st.file_count, st.total_size
+        FROM job_structure_settings s
+        LEFT JOIN job_structure_stats st ON st.structure_id = s.id
+        WHERE s.scan_pending = 0
+    '''
+    if cursor is None:
+        structures = conn.execute(
+            query + ' ORDER BY s.id DESC LIMIT ?',
+            (limit + 1,)
+        ).fetchall()
+    else:
+        structures = conn.execute(
+            query + ' AND s.id < ? ORDER BY s.id DESC LIMIT ?',
+            (cursor, limit + 1)
+        ).fetchall()
+    
+    has_more = len(structures) > limit
+    structures = structures[:limit]
+    
+    result = []
+    for structure in structures:
+        folder_count = structure['folder_count'] or 0
+        file_count = structure['file_count'] or 0
+        result.append({
+            'id': structure['id'],
+            'customer_name': structure['customer_name'],
+            'folder_path': structure['folder_path'],
+            'item_count': folder_count + file_count,
+            'folder_count': folder_count,
+            'file_count': file_count,
+            'total_size': structure['total_size'] or 0,
+            'created_at': structure['created_at'],
+            'updated_at': structure['updated_at']
+        })
+    
+    return jsonify({
+        'success': True,
+        'structures': result,
+        'next_cursor': result[-1]['id'] if has_more else None
+    })
+
+@job_structure_bp.route('/api/structures/<int:structure_id>/stats')
+def get_stats(structure_id):
+    """Get a structure's file and folder counts, total size and extension histogram"""
+    stats = get_structure_stats(get_db(), structure_id)
+    
+    if stats is None:
+        return jsonify({'success': False, 'error': 'Structure not found'}), 404
+    
+    return jsonify({'success': True, 'stats': stats})
+
+@job_structure_bp.route('/api/search')
+def search_items():
+    """
+    Full-text search over item names, aliases, paths and applications
+    
+    q takes words (all must match), "quoted phrases" and prefix* terms.
+    Optional structure_id and type (file or folder) narrow the search;
+    limit and offset page through the ranked results.
+    """
+    query = build_search_query(request.args.get('q', ''))
+    if query is None:
+        return jsonify({'success': False, 'error': 'q is required'}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        offset = max(int(request.args.get('offset', 0)), 0)
+        structure_id = request.args.get('structure_id', type=int)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit and offset must be numbers'}), 400
+    
+    item_type = request.args.get('type')
+    if item_type not in (None, 'file', 'folder'):
+        return jsonify({'success': False, 'error': 'type must be file or folder'}), 400
+    
+    try:
+        results = search_structure_items(get_db(), query, structure_id, item_type, limit + 1, offset)
+    except sqlite3.OperationalError as e:
+        return jsonify({'success': False, 'error': f'Invalid search: {e}'}), 400
+    
+    has_more = len(results) > limit
+    results = results[:limit]
+    return jsonify({
+        'success': True,
+        'query': query,
+        'results': results,
+        'next_offset': offset + limit if has_more else None
+    })
+
+@job_structure_bp.route('/api/structures/<int:structure_id>/children')
+def get_children(structure_id):
+    """Get the direct children of one folder of a structure, for lazy tree loading"""
+    path = request.args.get('path', '')
+    
+    conn = get_db()
+    children = get_structure_children(conn, structure_id, path)
+    
+    if children is None:
+        return jsonify({'success': False, 'error': f'Folder not found: {path}'}), 404
+    
+    return jsonify({'success': True, 'path': path, 'children': children})
+
 @job_structure_bp.route('/api/delete-structure/<int:structure_id>', methods=['DELETE'])
 def delete_structure(structure_id):
     """Delete a job structure"""
     try:
-        conn = get_db_connection()
-        conn.execute('DELETE FROM job_structure_settings WHERE id = ?', (structure_id,))
+        conn = get_db()
+        remove_structure(conn, structure_id)
         conn.commit()
-        conn.close()
         return jsonify({'success': True, 'message': 'Structure deleted successfully'})
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def scan_directory_structure(root_path):
-    """Scan directory structure and return organized data"""
+def build_structure_item(entry):
+    """Build the default structure item for a scanned entry"""
+    if entry.is_dir:
+        # Default alias is the name
+        return StructureItem(entry)
+    
+    # Smart alias generation for files
+    return StructureItem(entry, alias=generateSmartAlias(os.path.splitext(entry.name)[0]))
+
+def scan_directory_structure(root_path, workers=1, index=None, on_entry=None):
+    """
+    Scan directory structure and return a list of StructureItem objects
+    
+    If an index dict is passed, it is filled with the (is_dir, size, mtime)
+    of every entry so the structure can be rescanned incrementally later.
+    on_entry(entry, stats) is called after each entry, with the scanner's
+    'directories_listed' counter in stats; raising from it stops the scan.
+    """
+    if index is not None:
+        index[''] = (True, None, os.stat(root_path).st_mtime)
+    
     structure = []
+    stats = {}
+    entries = iter_directory_entries(root_path, workers=workers, stats=stats)
+    try:
+        for entry in entries:
+            structure.append(build_structure_item(entry))
+            if index is not None:
+                index[entry.path] = (entry.is_dir, entry.size, entry.mtime)
+            if on_entry is not None:
+                on_entry(entry, stats)
+    finally:
+        # Stop any read-ahead threads straight away if the scan is abandoned
+        entries.close()
     
-    def scan_directory(current_path, relative_path=""):
-        try:
-            items = os.listdir(current_path)
-            items.sort()  # Sort alphabetically
-            
-            for item in items:
-                item_path = os.path.join(current_path, item)
-                item_relative_path = os.path.join(relative_path, item) if relative_path else item
-                
-                if os.path.isdir(item_path):
-                    # It's a directory
-                    structure.append({
-                        'type': 'folder',
-                        'name': item,
-                        'path': item_relative_path,
-                        'full_path': item_path,
-                        'included': True,  # Default to included
-                        'alias': item,  # Default alias is the name
-                        'applications': '',  # Empty by default
-                        'collapsed': False,  # Default to expanded
-                        'children': []
-                    })
-                    
-                    # Recursively scan subdirectory
-                    scan_directory(item_path, item_relative_path)
-                else:
-                    # It's a file
-                    file_name, file_ext = os.path.splitext(item)
-                    structure.append({
-                        'type': 'file',
-                        'name': item,
-                        'file_name': file_name,
-                        'file_extension': file_ext,
-                        'path': item_relative_path,
-                        'full_path': item_path,
-                        'included': True,  # Default to included
-                        'alias': generateSmartAlias(file_name),  # Smart alias generation
-                        'applications': '',  # Empty by default
-                        'size': os.path.getsize(item_path)
-                    })
-        except PermissionError:
-            pass  # Skip directories we can't access
-    
-    scan_directory(root_path)
     return structure
 
+def load_scan_index(conn, structure_id):
+    """Load the scan index of a structure as {path: (is_dir, size, mtime)}"""
+    rows = conn.execute(
+        'SELECT path, is_dir, size, mtime FROM job_structure_scan_index WHERE structure_id = ?',
+        (structure_id,)
+    ).fetchall()
+    return {row['path']: (bool(row['is_dir']), row['size'], row['mtime']) for row in rows}
+
+def save_scan_index(conn, structure_id, index):
+    """Replace the scan index of a structure"""
+    conn.execute('DELETE FROM job_structure_scan_index WHERE structure_id = ?', (structure_id,))
+    conn.executemany(
+        'INSERT INTO job_structure_scan_index (structure_id, path, is_dir, size, mtime) VALUES (?, ?, ?, ?, ?)',
+        ((structure_id, path, is_dir, size, mtime) for path, (is_dir, size, mtime) in index.items())
+    )
+
 # Naming Conditions API Endpoints
 @job_structure_bp.route('/api/naming-conditions', methods=['GET'])
 def get_naming_conditions_api():
@@ -195,6 +636,10 @@ def create_naming_condition():
     """Create a new naming condition"""
     try:
         data = request.get_json()
+        error = check_condition(data)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+        
         condition_id = save_naming_condition(
             condition_type=data['type'],
             pattern=data['pattern'],
@@ -215,6 +660,21 @@ def update_naming_condition_api(condition_id):
     """Update a naming condition"""
     try:
         data = request.get_json()
+        
+        # Check the condition as it will be after the update, unless only
+        # enabled or replacement change
+        existing = None
+        if any(data.get(field) is not None for field in ('type', 'pattern', 'chains')):
+            existing = next((c for c in get_naming_conditions() if c['id'] == condition_id), None)
+        if existing is not None:
+            error = check_condition({
+                'type': data.get('type') or existing['type'],
+                'pattern': data['pattern'] if data.get('pattern') is not None else existing['pattern'],
+                'chains': data['chains'] if data.get('chains') is not None else existing['chains']
+            })
+            if error:
+                return jsonify({'success': False, 'error': error}), 400
+        
         success = update_naming_condition(
             condition_id=condition_id,
             condition_type=data.get('type'),
@@ -243,76 +703,291 @@ def delete_naming_condition_api(condition_id):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-@job_structure_bp.route('/api/apply-conditions-to-all', methods=['POST'])
-def apply_conditions_to_all():
-    """Apply naming conditions to all structures"""
-    try:
-        # Get all conditions
+@job_structure_bp.route('/api/naming-conditions/preview', methods=['POST'])
+def preview_naming_conditions():
+    """
+    Preview the aliases a rule set would produce, without saving anything
+    
+    Takes either a list of names or stored structures (structure_ids, all
+    structures if omitted) and the conditions to preview (the stored ones if
+    omitted). Each unique name is resolved once and only items whose alias
+    would change are returned.
+    """
+    data = request.get_json() or {}
+    conditions = data.get('conditions')
+    if conditions is None:
         conditions = get_naming_conditions()
+    else:
+        error = check_posted_conditions(conditions)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+    limit = data.get('limit', 500)
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 0:
+        return jsonify({'success': False, 'error': 'limit must be a non-negative integer'}), 400
+    structure_ids = data.get('structure_ids')
+    if structure_ids is not None and (
+            not isinstance(structure_ids, list)
+            or not all(isinstance(structure_id, int) and not isinstance(structure_id, bool) for structure_id in structure_ids)):
+        return jsonify({'success': False, 'error': 'structure_ids must be a list of integers'}), 400
+    if 'names' in data and (
+            not isinstance(data['names'], list) or not all(isinstance(name, str) for name in data['names'])):
+        return jsonify({'success': False, 'error': 'names must be a list of strings'}), 400
+    
+    try:
+        if 'names' in data:
+            aliases, disabled = resolve_aliases_checked(set(data['names']), conditions)
+            return jsonify({'success': True, 'aliases': aliases, 'changed_count': len(aliases), 'disabled': disabled})
         
-        # Get all structures
-        conn = get_db_connection()
-        structures = conn.execute(
-            'SELECT id, structure_data FROM job_structure_settings'
-        ).fetchall()
-        conn.close()
+        conn = get_db()
+        if structure_ids:
+            placeholders = ', '.join('?' * len(structure_ids))
+            items = conn.execute(f'''
+                SELECT structure_id, path, name, alias FROM job_structure_items
+                WHERE structure_id IN ({placeholders})
+                ORDER BY structure_id, sort_key
+            ''', structure_ids).fetchall()
+        else:
+            items = conn.execute(
+                'SELECT structure_id, path, name, alias FROM job_structure_items ORDER BY structure_id, sort_key'
+            ).fetchall()
         
-        updated_count = 0
-        for structure in structures:
-            structure_data = json.loads(structure['structure_data'])
-            
-            # Apply conditions to structure
-            updated_structure = apply_naming_conditions_to_structure(structure_data, conditions)
-            
-            # Save updated structure back to database
-            conn = get_db_connection()
-            conn.execute(
-                'UPDATE job_structure_settings SET structure_data = ?, updated_at = ? WHERE id = ?',
-                (json.dumps(updated_structure), datetime.now(), structure['id'])
-            )
-            conn.commit()
-            conn.close()
-            
-            updated_count += 1
+        aliases, disabled = resolve_aliases_checked({item['name'] for item in items}, conditions)
+        changes = [
+            {
+                'structure_id': item['structure_id'],
+                'path': item['path'],
+                'name': item['name'],
+                'alias': item['alias'],
+                'new_alias': aliases[item['name']]
+            }
+            for item in items
+            if item['name'] in aliases and aliases[item['name']] != item['alias']
+        ]
         
         return jsonify({
-            'success': True, 
-            'message': f'Applied conditions to {updated_count} structures',
-            'updated_count': updated_count
+            'success': True,
+            'changes': changes[:limit],
+            'changed_count': len(changes),
+            'truncated': len(changes) > limit,
+            'disabled': disabled
         })
+    except (KeyError, TypeError) as e:
+        return jsonify({'success': False, 'error': f'Invalid condition: {e}'}), 400
+
+ALIAS_CHUNK_SIZE = 2000  # Names handed to a worker process at a time
+PARALLEL_ALIAS_THRESHOLD = 20000  # Fewer unique names than this are resolved in-thread
+
+def run_apply_conditions_job(job, conditions, workers=1):
+    """
+    Background job: apply naming conditions to every stored item
+    
+    Aliases are resolved once per unique name, in a process pool when there
+    are enough names to be worth it, and all changed aliases are written back
+    in a single transaction.
+    """
+    job.update(phase='loading')
+    conn = get_db()
+    items = conn.execute('SELECT id, name, alias FROM job_structure_items').fetchall()
+    structure_count = conn.execute('SELECT COUNT(*) FROM job_structure_settings').fetchone()[0]
+    
+    names = list({item['name'] for item in items})
+    chunks = [names[i:i + ALIAS_CHUNK_SIZE] for i in range(0, len(names), ALIAS_CHUNK_SIZE)]
+    job.update(phase='matching', items_total=len(items), names_total=len(names), names_done=0)
+    
+    aliases = {}
+    disabled = {}
+    if workers > 1 and len(names) >= PARALLEL_ALIAS_THRESHOLD:
+        # Imported here so startup doesn't pay for loading multiprocessing
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Spawn rather than fork: a forked child of this multi-threaded server
+        # could inherit a lock (alias cache, compiled conditions) held by
+        # another thread and block on it forever
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {executor.submit(resolve_aliases_checked, chunk, conditions): len(chunk) for chunk in chunks}
+            names_done = 0
+            for future in as_completed(futures):
+                if job.cancel_requested:
+                    for pending in futures:
+                        pending.cancel()
+                    job.check_cancelled()
+                chunk_aliases, chunk_disabled = future.result()
+                aliases.update(chunk_aliases)
+                disabled.update(chunk_disabled)
+                names_done += futures[future]
+                job.update(names_done=names_done)
+    else:
+        names_done = 0
+        for chunk in chunks:
+            job.check_cancelled()
+            chunk_aliases, chunk_disabled = resolve_aliases_checked(chunk, conditions)
+            aliases.update(chunk_aliases)
+            disabled.update(chunk_disabled)
+            names_done += len(chunk)
+            job.update(names_done=names_done)
+    
+    job.check_cancelled()
+    record_disabled_conditions(disabled)
+    updates = [
+        (aliases[item['name']], item['id'])
+        for item in items
+        if item['name'] in aliases and aliases[item['name']] != item['alias']
+    ]
+    job.update(phase='writing', items_updated=len(updates))
+    
+    with conn:
+        conn.executemany('UPDATE job_structure_items SET alias = ? WHERE id = ?', updates)
+        conn.execute('UPDATE job_structure_settings SET updated_at = ?', (datetime.now(),))
+    
+    job.update(phase='done')
+    return {
+        'message': f'Applied conditions to {structure_count} structures',
+        'updated_count': structure_count,
+        'items_updated': len(updates),
+        'disabled': disabled
+    }
+
+@job_structure_bp.route('/api/apply-conditions-to-all', methods=['POST'])
+def apply_conditions_to_all():
+    """Start a background job applying naming conditions to all structures"""
+    try:
+        conditions = get_naming_conditions()
+        job = submit_job(
+            'apply-conditions', run_apply_conditions_job, conditions,
+            workers=current_app.config.get('APPLY_CONDITIONS_WORKERS', 1)
+        )
+        return jsonify({'success': True, 'job_id': job.id}), 202
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def run_dry_run_job(job, conditions, sample_size=5):
+    """
+    Background job: report what a rule set would do to every stored item
+    
+    Nothing is written, not even conditions that ran over budget; those are
+    only reported. Each condition gets its match and change counts, sample
+    before/after aliases and the CPU time it took.
+    """
+    job.update(phase='loading')
+    conn = get_db()
+    name_counts = {
+        row['name']: row['item_count']
+        for row in conn.execute('SELECT name, COUNT(*) AS item_count FROM job_structure_items GROUP BY name')
+    }
+    item_count = sum(name_counts.values())
+    
+    job.check_cancelled()
+    job.update(phase='profiling', items_total=item_count, names_total=len(name_counts))
+    report = profile_naming_conditions(name_counts, conditions, sample_size)
+    
+    job.update(phase='done')
+    report['items_total'] = item_count
+    report['names_total'] = len(name_counts)
+    return report
+
+@job_structure_bp.route('/api/naming-conditions/dry-run', methods=['POST'])
+def dry_run_naming_conditions():
+    """Start a background job reporting the impact of a rule set on all structures"""
+    data = request.get_json(silent=True) or {}
+    conditions = data.get('conditions')
+    if conditions is None:
+        conditions = get_naming_conditions()
+    else:
+        error = check_posted_conditions(conditions)
+        if error:
+            return jsonify({'success': False, 'error': error}), 400
+    sample_size = data.get('sample_size', 5)
+    if not isinstance(sample_size, int) or isinstance(sample_size, bool) or sample_size < 0:
+        return jsonify({'success': False, 'error': 'sample_size must be a non-negative integer'}), 400
+    
+    try:
+        job = submit_job('dry-run-conditions', run_dry_run_job, conditions, sample_size)
+        return jsonify({'success': True, 'job_id': job.id}), 202
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@job_structure_bp.route('/api/admin/alias-cache', methods=['GET'])
+def get_alias_cache_stats():
+    """Hit/miss counters for the naming condition and smart alias caches"""
+    smart_alias = generateSmartAlias.cache_info()
+    return jsonify({
+        'success': True,
+        'naming_conditions': alias_cache_stats(),
+        'smart_alias': {
+            'hits': smart_alias.hits,
+            'misses': smart_alias.misses,
+            'size': smart_alias.currsize,
+            'max_size': smart_alias.maxsize
+        }
+    })
+
+@job_structure_bp.route('/api/admin/alias-cache', methods=['DELETE'])
+def clear_alias_cache_api():
+    """Empty the alias caches"""
+    clear_alias_cache()
+    generateSmartAlias.cache_clear()
+    return jsonify({'success': True})
+
+@job_structure_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get the status and progress of a background job"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@job_structure_bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """Stream a job's status and progress as Server-Sent Events until it finishes"""
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    def events():
+        while True:
+            version = job.version
+            yield f'data: {json.dumps(job.to_dict())}\n\n'
+            if job.finished:
+                return
+            # Comment lines keep idle connections from timing out
+            while job.wait_for_change(version, timeout=15) == version:
+                yield ': keepalive\n\n'
+    
+    return Response(events(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@job_structure_bp.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job_api(job_id):
+    """Cancel a background job"""
+    if not cancel_job(job_id):
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True})
+
 @job_structure_bp.route('/api/undo-conditions', methods=['POST'])
 def undo_conditions():
     """Undo naming conditions by resetting aliases to original names"""
     try:
         # Get all structures
-        conn = get_db_connection()
+        conn = get_db()
         structures = conn.execute(
-            'SELECT id, structure_data FROM job_structure_settings'
+            'SELECT id FROM job_structure_settings'
         ).fetchall()
-        conn.close()
         
         updated_count = 0
         for structure in structures:
-            structure_data = json.loads(structure['structure_data'])
-            
             # Reset aliases to original names
-            for item in structure_data:
-                item['alias'] = item['name']
-            
-            # Save updated structure back to database
-            conn = get_db_connection()
             conn.execute(
-                'UPDATE job_structure_settings SET structure_data = ?, updated_at = ? WHERE id = ?',
-                (json.dumps(structure_data), datetime.now(), structure['id'])
+                'UPDATE job_structure_items SET alias = name WHERE structure_id = ? AND alias IS NOT name',
+                (structure['id'],)
             )
-            conn.commit()
-            conn.close()
-            
+            conn.execute(
+                'UPDATE job_structure_settings SET updated_at = ? WHERE id = ?',
+                (datetime.now(), structure['id'])
+            )
+
             updated_count += 1
-        
+
+        conn.commit()
+
         return jsonify({
             'success': True, 
             'message': f'Reset aliases for {updated_count} structures',
@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app
 
 main_bp = Blueprint('main', __name__)
 
@@ -13,3 +13,23 @@ def status():
         'app': 'Engineering/Drafting Tools',
         'version': '1.0.0'
     })
+
+@main_bp.route('/api/health')
+def health():
+    """Readiness check polled by the Electron launcher before it loads the UI"""
+    return jsonify({
+        'status': 'ready',
+        'startup_seconds': current_app.config.get('STARTUP_TIMINGS', {}).get('create_app')
+    })
+
+@main_bp.route('/api/startup')
+def startup():
+    """Seconds spent in each startup phase and from launch to the first request"""
+    timings = current_app.config.get('STARTUP_TIMINGS', {})
+    budget = current_app.config.get('STARTUP_BUDGET')
+    first_request = timings.get('first_request')
+    return jsonify({
+        'timings': timings,
+        'budget': budget,
+        'within_budget': first_request <= budget if first_request is not None else None
+    })
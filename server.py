@@ -0,0 +1,88 @@
+"""
+Production Server
+Serves the Flask app without the debugger or reloader, on a bounded pool of
+request threads. Uses waitress when it is installed and falls back to a
+pooled Werkzeug server otherwise.
+
+Once the socket is bound the server prints a single readiness line to stdout,
+READY_PREFIX followed by JSON with the host and the port actually bound, so
+a launcher can start the app on an ephemeral port (port 0) and find it.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer
+
+READY_PREFIX = 'BACKEND_READY '
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Werkzeug server that handles requests on a fixed-size thread pool"""
+
+    def __init__(self, host, port, app, threads=8):
+        super().__init__(host, port, app)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle_request, request, client_address)
+
+    def _handle_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+def announce_ready(host, port):
+    """Tell the launcher the server is listening; stdout is a pipe, so flush"""
+    print(READY_PREFIX + json.dumps({'host': host, 'port': port}), flush=True)
+
+def serve(app, host='127.0.0.1', port=5000, threads=8):
+    """
+    Serve the app until interrupted
+
+    Everything runs in one process: background jobs and their progress live
+    in memory (see jobs.py), so requests are spread over threads rather than
+    worker processes.
+
+    Args:
+        app (Flask): The application to serve
+        host (str): Interface to bind
+        port (int): Port to bind, 0 for any free port
+        threads (int): Number of request handling threads
+    """
+    app.debug = False
+
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        waitress_serve = None
+
+    if waitress_serve is not None:
+        from waitress.server import create_server
+        server = create_server(app, host=host, port=port, threads=threads)
+        port = server.effective_port
+        print(f"Serving on http://{host}:{port} with waitress ({threads} threads)")
+        announce_ready(host, port)
+        try:
+            server.run()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+        return
+
+    server = PooledWSGIServer(host, port, app, threads=threads)
+    port = server.server_port
+    print(f"Serving on http://{host}:{port} ({threads} threads)")
+    announce_ready(host, port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()